@@ -1,20 +1,66 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
 from api import models
 
 
+def estimate_count(queryset):
+    """Postgres planner estimate of the rows of an unfiltered queryset, `None` when it can't be estimated"""
+
+    if connection.vendor != "postgresql" or queryset.query.where:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+
+    # `-1` when the table has never been analyzed
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator using the planner estimate as count of huge unfiltered tables, as an exact `COUNT(*)` times out on them.
+
+    Note:
+    Filtered or searched querysets, and tables under `min_estimated_count` rows, are counted exactly.
+    """
+
+    min_estimated_count = 100_000
+
+    @cached_property
+    def count(self):
+        estimated_count = estimate_count(self.object_list)
+        if estimated_count is not None and estimated_count >= self.min_estimated_count:
+            return estimated_count
+
+        return super().count
+
+
 class BaseModelAdmin(admin.ModelAdmin):
     readonly_fields = ["id", "created_at", "updated_at"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Avoid a second `COUNT(*)` of the whole table when filtering
 
 
 class ProviderAdmin(BaseModelAdmin):
     fields = BaseModelAdmin.readonly_fields + ["name"]
     list_display = ["name"]
+    search_fields = ["name"]
 
 
 class CheckAdmin(BaseModelAdmin):
     fields = BaseModelAdmin.readonly_fields + ["provider", "name"]
     list_display = ["provider__name", "name"]
+    list_select_related = ["provider"]
+    search_fields = ["name"]
+    autocomplete_fields = ["provider"]
+
+    # `__str__` uses the provider name, also in the autocomplete results
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("provider")
 
 
 class ScanAdmin(BaseModelAdmin):
@@ -26,14 +72,48 @@ class ScanAdmin(BaseModelAdmin):
         "finished_at",
         "name",
         "comment",
+        "priority",
+        "baseline",
+        "checks_total",
+        "checks_executed",
+        "checks_success",
+        "checks_failed",
+        "checks_carried",
     ]
-    readonly_fields = BaseModelAdmin.readonly_fields + ["success"]
-    list_display = ["provider__name", "status", "success", "name"]
+    readonly_fields = BaseModelAdmin.readonly_fields + [
+        "success",
+        "checks_total",
+        "checks_executed",
+        "checks_success",
+        "checks_failed",
+        "checks_carried",
+    ]
+    list_display = ["provider__name", "status", "success", "name", "checks_executed", "checks_total"]
+    list_select_related = ["provider"]
+    search_fields = ["name"]
+    autocomplete_fields = ["provider", "baseline"]
+
+    # `__str__` uses the provider name, also in the autocomplete results
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("provider")
 
 
 class FindingAdmin(BaseModelAdmin):
-    fields = BaseModelAdmin.readonly_fields + ["scan", "check_parent", "success", "comment"]
+    fields = BaseModelAdmin.readonly_fields + ["scan", "check_parent", "success", "comment", "executed_at"]
+    readonly_fields = BaseModelAdmin.readonly_fields + ["executed_at"]
     list_display = ["scan__provider__name", "scan__name", "check_name", "success"]
+    list_select_related = ["scan__provider", "check_parent"]
+    # Rendering every scan and check into a select doesn't scale, they are searched instead
+    autocomplete_fields = ["scan", "check_parent"]
+
+    def save_model(self, request, obj, form, change):
+        """Keep the scan counters right if `success` is changed, and the validators of the findings of the scan"""
+
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.update_scan_counters(form.initial.get("success"))
+        else:
+            models.Scan.objects.filter(id=obj.scan_id).touch()
 
     @admin.display(description="Check name", ordering="check_parent__name")
     def check_name(self, obj):
@@ -42,7 +122,26 @@ class FindingAdmin(BaseModelAdmin):
         return obj.check_parent.name
 
 
+class ScanScheduleAdmin(BaseModelAdmin):
+    fields = BaseModelAdmin.readonly_fields + [
+        "provider",
+        "name",
+        "cron",
+        "checks",
+        "priority",
+        "enabled",
+        "next_run_at",
+        "last_run_at",
+    ]
+    readonly_fields = BaseModelAdmin.readonly_fields + ["next_run_at", "last_run_at"]
+    list_display = ["provider__name", "name", "cron", "enabled", "next_run_at"]
+    list_select_related = ["provider"]
+    search_fields = ["name"]
+    autocomplete_fields = ["provider", "checks"]
+
+
 admin.site.register(models.Provider, ProviderAdmin)
 admin.site.register(models.Check, CheckAdmin)
 admin.site.register(models.Scan, ScanAdmin)
 admin.site.register(models.Finding, FindingAdmin)
+admin.site.register(models.ScanSchedule, ScanScheduleAdmin)
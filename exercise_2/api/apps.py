@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class APIConfig(AppConfig):
     name = "api"
+
+    # Connecting the signals invalidating the cached catalog
+    def ready(self):
+        from api import catalog  # noqa: F401
@@ -0,0 +1,139 @@
+import hashlib
+import uuid
+
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from api import models
+from api.conditional import ConditionalGetMixin
+
+VERSION_KEY = "catalog-version:{scope}"
+PROVIDERS_SCOPE = "providers"  # The providers list, it changes with any provider or check
+
+
+def get_provider_scope(provider_id):
+    return f"provider-{provider_id}"
+
+
+def get_version(scope):
+    """Current version of the cached responses of the scope, a new one if it's not cached"""
+
+    return cache.get_or_set(VERSION_KEY.format(scope=scope), uuid.uuid4().hex, timeout=None)
+
+
+def bump_version(provider_id=None):
+    """
+    Invalidate the cached providers list, and the provider detail and checks of the given provider, if any.
+
+    Note:
+    Versions are bumped at once and again when the transaction commits, so a response cached in between, while the
+    change is not visible to other connections yet, is not served after it. Cached responses are not deleted, they
+    expire with `CATALOG_CACHE_TIMEOUT`.
+    """
+
+    scopes = [PROVIDERS_SCOPE]
+    if provider_id is not None:
+        scopes.append(get_provider_scope(provider_id))
+
+    def bump():
+        cache.set_many({VERSION_KEY.format(scope=scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=models.Provider)
+def provider_changed(sender, instance, **kwargs):
+    bump_version(instance.id)
+
+
+@receiver([post_save, post_delete], sender=models.Check)
+def check_changed(sender, instance, **kwargs):
+    bump_version(instance.provider_id)
+
+
+def sync_checks(provider_id, names, prune=False):
+    """
+    Create the missing checks of the provider at once, and with `prune` delete the ones not in `names`, returns the
+    `created`, `unchanged` and `removed` counts, and the names of the `conflicts` not pruned.
+
+    Note:
+    Checks only have a name, so existing ones are left as they are, not updated, keeping their `updated_at` and the
+    conditional `GET` validators of the catalog. The insert is an upsert, so a check created meanwhile is not an error.
+    Checks with findings are never pruned, deleting them would delete the findings too, changing past scans without
+    their counters and `success`, they are answered as `conflicts` instead.
+    """
+
+    with transaction.atomic():
+        checks = models.Check.objects.filter(provider_id=provider_id)
+        existing = set(checks.filter(name__in=names).values_list("name", flat=True))
+        missing = [models.Check(provider_id=provider_id, name=name) for name in names if name not in existing]
+        models.Check.objects.bulk_create(
+            missing,
+            batch_size=settings.FINDINGS_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["provider", "name"],
+            update_fields=["name"],
+        )
+
+        removed, conflicts = 0, []
+        if prune:
+            stale = checks.exclude(name__in=names)
+            has_findings = Exists(models.Finding.objects.filter(check_parent=OuterRef("pk")))
+            conflicts = list(stale.filter(has_findings).order_by("name").values_list("name", flat=True))
+            removed = stale.filter(~has_findings).delete()[1].get(models.Check._meta.label, 0)
+
+        if missing:
+            bump_version(provider_id)  # `bulk_create` sends no signals
+
+    return {"created": len(missing), "unchanged": len(names) - len(missing), "removed": removed, "conflicts": conflicts}
+
+
+class CachedCatalogMixin(ConditionalGetMixin):
+    """
+    ViewSet mixin serving `list` and `retrieve` from the cache, keyed by the URL and the version of the provider in the
+    `catalog_provider_kwarg` URL kwarg (or of the providers list if not in the URL), so in the steady state the catalog
+    is read without touching the database. Their conditional `GET` validators are cached along.
+
+    Note:
+    Writes through the ORM bump the versions with signals, but `bulk_create` and `update` don't send them, so they must
+    call `bump_version`. With the `locmem` cache, each process has its own cache and versions, so writes served by
+    another process are only seen after `CATALOG_CACHE_TIMEOUT`, use the `file` cache with several API workers.
+    """
+
+    catalog_provider_kwarg = "pk"
+
+    def get_catalog_cache_key(self, request):
+        provider_id = self.kwargs.get(self.catalog_provider_kwarg)
+        scope = PROVIDERS_SCOPE if provider_id is None else get_provider_scope(provider_id)
+        # URLs can be too long for keys, and the response also depends on the renderer
+        url = f"{request.build_absolute_uri()}|{request.headers.get('Accept', '')}"
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        return f"catalog:{scope}:{get_version(scope)}:response:{url_hash}"
+
+    # The cached response is answered along its validators, so `304` too doesn't touch the database
+    def cached_response(self, request, get_response):
+        key = self.get_catalog_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            data, validators = cached
+            return super().conditional_response(request, validators, partial(Response, data))
+
+        response = get_response()
+        if response.status_code == 200:
+            cache.set(key, (response.data, self.validators), settings.CATALOG_CACHE_TIMEOUT)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, partial(super().retrieve, request, *args, **kwargs))
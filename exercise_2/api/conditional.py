@@ -0,0 +1,101 @@
+import calendar
+import hashlib
+
+from functools import partial
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin adding `ETag` and `Last-Modified` to `list` and `retrieve`, answering `304 Not Modified` when the
+    client already has them, without serializing the data.
+
+    Note:
+    The validators are built from the rows already fetched for the response, their `pk` and `conditional_fields` (every
+    write bumps `updated_at`), along with the `count` and links of the page, so they cost no extra query. Lists whose
+    rows are all written through a parent (e.g. the findings of a scan) can build them from it in `get_list_validators`
+    instead, so a `304` doesn't even fetch the page. Lists only have an `ETag`, as deleting rows doesn't change their
+    max `updated_at`, and so do details with fields not following `updated_at` (`conditional_last_modified` off).
+    """
+
+    conditional_fields = ["updated_at"]
+    conditional_last_modified = True
+
+    def get_validators(self, request, rows, fields=None, extra=(), with_last_modified=True):
+        """`(etag, last_modified)` of a response showing `rows`, and the `extra` values (e.g. the `count` of a list)"""
+
+        # The same data is represented differently by URL (e.g. pages) and renderer
+        fingerprint = [request.get_full_path(), request.headers.get("Accept", ""), *map(str, extra)]
+        fields = fields or self.conditional_fields
+        for row in rows:
+            fingerprint += [str(row.pk), *(str(getattr(row, field, None)) for field in fields)]
+        etag = f'W/"{hashlib.sha256("|".join(fingerprint).encode()).hexdigest()[:32]}"'
+
+        if not with_last_modified:
+            return etag, None
+
+        return etag, max((row.updated_at for row in rows), default=None)
+
+    def get_list_validators(self, request):
+        """Validators of `list` known before fetching its page, `None` to build them from the page"""
+
+        return None
+
+    def get_page_validators(self, request, page):
+        paginator = self.paginator
+        extra = [getattr(paginator, "count", None), paginator.get_next_link(), paginator.get_previous_link()]
+        return self.get_validators(request, page, extra=extra, with_last_modified=False)
+
+    def get_not_modified_response(self, request, validators):
+        if validators is None:
+            return None
+
+        etag, last_modified = validators
+        timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified else None
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def set_validators(self, response, validators):
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(calendar.timegm(last_modified.utctimetuple()))
+
+        return response
+
+    def conditional_response(self, request, validators, get_response):
+        self.validators = validators  # Kept for the mixins caching the response along
+        response = self.get_not_modified_response(request, validators) or get_response()
+
+        return self.set_validators(response, validators)
+
+    async def aconditional_response(self, request, validators, get_response):
+        """Async version of `conditional_response`, awaiting `get_response`"""
+
+        self.validators = validators
+        response = self.get_not_modified_response(request, validators) or await get_response()
+
+        return self.set_validators(response, validators)
+
+    def get_page_response(self, page):
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def get_object_response(self, instance):
+        return Response(self.get_serializer(instance).data)
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_list_validators(request)
+        if validators is not None:
+            return self.conditional_response(request, validators, partial(super().list, request, *args, **kwargs))
+
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        validators = self.get_page_validators(request, page)
+        return self.conditional_response(request, validators, partial(self.get_page_response, page))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        validators = self.get_validators(request, [instance], with_last_modified=self.conditional_last_modified)
+        return self.conditional_response(request, validators, partial(self.get_object_response, instance))
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.db import connection, connections, transaction
+
+from api.utils import logging
+
+logger = logging.getLogger(__name__)
+
+SCAN_STATUS_CHANNEL = "scan_status"
+
+
+def notify_scan_status(scan_id, status):
+    """
+    Publish a scan status change to the clients waiting for it, when the current transaction commits.
+
+    Note:
+    On Postgres it's a `NOTIFY`, so waiting clients of every API process are woken up. With other databases (tests and
+    local SQLite) only the clients of the current process are.
+    """
+
+    payload = json.dumps({"id": str(scan_id), "status": status})
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [SCAN_STATUS_CHANNEL, payload])
+
+    else:
+        transaction.on_commit(lambda: listener.dispatch(payload))
+
+
+class Subscription:
+    """A client waiting for the status change of a scan, it can wait from sync or async code"""
+
+    def __init__(self, scan_id):
+        self.scan_id = str(scan_id)
+        self.status = None
+        self.event = threading.Event()
+        self.async_event = None
+
+        try:
+            self.loop = asyncio.get_running_loop()
+            self.async_event = asyncio.Event()
+
+        except RuntimeError:
+            self.loop = None
+
+    def set(self, status):
+        self.status = status
+        self.event.set()
+        if self.async_event is not None:
+            self.loop.call_soon_threadsafe(self.async_event.set)
+
+    def wait(self, timeout):
+        """Block until the status changes or `timeout` seconds, returns the new status or `None`"""
+
+        self.event.wait(timeout)
+        return self.status
+
+    async def async_wait(self, timeout):
+        """Async version of `wait`"""
+
+        try:
+            await asyncio.wait_for(self.async_event.wait(), timeout)
+
+        except TimeoutError:
+            pass
+
+        return self.status
+
+
+class ScanStatusListener:
+    """
+    Process-wide listener of the scan status changes, so any number of waiting clients cost one database connection.
+
+    Note:
+    It's a daemon thread `LISTEN`ing on its own connection, started with the first subscription. If the connection is
+    lost, all the subscriptions are woken up without status, so their clients read it again instead of missing a change.
+    `LISTEN` is issued by the thread, so clients must `wait_ready` before reading the status, otherwise a change
+    notified before it (e.g. for the first subscriber, or while reconnecting) would be missed.
+    """
+
+    reconnect_delay = 1.0
+    ready_timeout = 5.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}  # `{scan_id: {subscription, ...}}`
+        self.thread = None
+        self.ready = threading.Event()  # Set while `LISTEN`ing
+
+    def subscribe(self, scan_id):
+        self.start()
+        subscription = Subscription(scan_id)
+
+        with self.lock:
+            self.subscriptions.setdefault(subscription.scan_id, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.scan_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.scan_id, None)
+
+    def dispatch(self, payload):
+        data = json.loads(payload)
+
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(data["id"], ()))
+
+        for subscription in subscriptions:
+            subscription.set(data["status"])
+
+    def wait_ready(self):
+        """Block until the listener is `LISTEN`ing, at most `ready_timeout` seconds, returns if it is"""
+
+        if connection.vendor != "postgresql":
+            return True
+
+        return self.ready.wait(self.ready_timeout)
+
+    async def async_wait_ready(self):
+        """Async version of `wait_ready`"""
+
+        if connection.vendor != "postgresql" or self.ready.is_set():
+            return True
+
+        return await asyncio.to_thread(self.wait_ready)
+
+    def start(self):
+        if connection.vendor != "postgresql":
+            return
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.listen, name="scan-status-listener", daemon=True)
+                self.thread.start()
+
+    def listen(self):
+        while True:
+            listen_connection = connections.create_connection("default")
+
+            try:
+                listen_connection.set_autocommit(True)
+                with listen_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {SCAN_STATUS_CHANNEL}")
+
+                self.ready.set()
+                for notify in listen_connection.connection.notifies():
+                    self.dispatch(notify.payload)
+
+            except Exception:
+                logger.exception("Scan status listener disconnected, reconnecting")
+
+            finally:
+                self.ready.clear()
+                listen_connection.close()
+
+            with self.lock:
+                subscriptions = [subscription for values in self.subscriptions.values() for subscription in values]
+
+            for subscription in subscriptions:
+                subscription.set(None)
+
+            time.sleep(self.reconnect_delay)
+
+
+listener = ScanStatusListener()
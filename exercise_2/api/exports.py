@@ -0,0 +1,49 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Exported finding columns, as `(output name, queryset lookup)`, the check name is joined for easing reports
+FINDING_FIELDS = [
+    ("id", "id"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+    ("scan_id", "scan_id"),
+    ("check_id", "check_parent_id"),
+    ("check_name", "check_parent__name"),
+    ("success", "success"),
+    ("comment", "comment"),
+]
+
+
+class Echo:
+    """File-like object that returns what is written, so `csv.writer` can be used for streaming"""
+
+    def write(self, value):
+        return value
+
+
+def iter_findings(findings, chunk_size):
+    """Iterate the findings as tuples with a server-side cursor, so memory is constant regardless of the scan size"""
+
+    lookups = [lookup for _, lookup in FINDING_FIELDS]
+    return findings.order_by("created_at", "id").values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def findings_to_ndjson(rows):
+    names = [name for name, _ in FINDING_FIELDS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row, strict=True)), cls=DjangoJSONEncoder) + "\n"
+
+
+def findings_to_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in FINDING_FIELDS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (findings_to_ndjson, "application/x-ndjson"),
+    "csv": (findings_to_csv, "text/csv"),
+}
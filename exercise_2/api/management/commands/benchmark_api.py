@@ -0,0 +1,103 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from api import models, profiling, tasks
+
+
+class Rollback(Exception):
+    """Raised for rolling back the benchmarked scan"""
+
+
+class Command(BaseCommand):
+    help = "Measure latency and query counts of every API `GET` route and of the scan task, saving them as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per route, the median time is reported")
+        parser.add_argument("--output", help="Path of the JSON file where the results are saved")
+        parser.add_argument("--compare", help="Path of a previous JSON results file to compare with")
+        parser.add_argument("--threshold", type=float, default=1.5, help="Time ratio considered as a regression")
+        parser.add_argument("--skip-task", action="store_true", help="Don't benchmark the `start_scan` task")
+
+    def handle(self, *args, **options):
+        # The biggest scan is the worst case for the findings routes
+        scan = models.Scan.objects.order_by("-checks_executed", "-created_at").first()
+        if scan is None:
+            raise CommandError("No scans found, run `generate_load_data` first")
+
+        results = {
+            "dataset": {
+                "providers": models.Provider.objects.count(),
+                "checks": models.Check.objects.count(),
+                "scans": models.Scan.objects.count(),
+                "findings": models.Finding.objects.count(),
+            },
+            "routes": self.benchmark_routes(scan, options["repeat"]),
+        }
+        if not options["skip_task"]:
+            results["tasks"] = {"start_scan": self.benchmark_task(scan)}
+
+        for name, result in {**results["routes"], **results.get("tasks", {})}.items():
+            self.stdout.write(f"{name}: {result['ms']:.2f} ms - {result['queries']} queries")
+
+        if options["output"]:
+            with open(options["output"], "w") as fp:
+                json.dump(results, fp, indent=4)
+            self.stdout.write(f"Results saved in {options['output']}")
+
+        if options["compare"]:
+            self.compare(results, options["compare"], options["threshold"])
+
+    def benchmark_routes(self, scan, repeat):
+        client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        results = {}
+
+        for name, url in profiling.get_routes(scan).items():
+            status_codes = []
+            result = profiling.measure(lambda url=url: status_codes.append(profiling.get_url(client, url)), repeat)
+            results[name] = {"url": url, "status": status_codes[-1], **result}
+
+        return results
+
+    def benchmark_task(self, scan):
+        """Run a scan of the biggest provider without check delays, everything is rolled back"""
+
+        try:
+            with transaction.atomic(), override_settings(CHECK_SLEEP_TIME=0, CHECK_EXCEPTION_RATE=0):
+                new_scan = models.Scan.objects.create(provider_id=scan.provider_id, name=f"Benchmark {scan.id}")
+                result = profiling.measure(lambda: tasks.start_scan(scan_id=str(new_scan.id)))
+                result["checks"] = models.Scan.objects.get(id=new_scan.id).checks_executed
+                raise Rollback
+
+        except Rollback:
+            return result
+
+    def compare(self, results, path, threshold):
+        """Show the routes slower than `threshold` times, or with more queries, than the previous results"""
+
+        with open(path) as fp:
+            previous = json.load(fp)
+
+        previous_all = {**previous.get("routes", {}), **previous.get("tasks", {})}
+        regressions = 0
+        for name, result in {**results["routes"], **results.get("tasks", {})}.items():
+            before = previous_all.get(name)
+            if before is None:
+                continue
+
+            if result["queries"] > before["queries"] or result["ms"] > before["ms"] * threshold:
+                regressions += 1
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Regression in {name}: {before['ms']:.2f} -> {result['ms']:.2f} ms, "
+                        f"{before['queries']} -> {result['queries']} queries"
+                    )
+                )
+
+        if regressions:
+            raise CommandError(f"{regressions} regressions found")
+
+        self.stdout.write(self.style.SUCCESS("No regressions found!"))
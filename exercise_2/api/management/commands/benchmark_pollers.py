@@ -0,0 +1,137 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.error import URLError
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from api import models
+
+# Same servers as `entrypoint.sh`, bound to localhost
+SERVERS = {
+    "sync": ["gunicorn", "--bind", "127.0.0.1:{port}", "--workers", "{workers}", "prowler_manager.wsgi:application"],
+    "async": [
+        "uvicorn",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        "{port}",
+        "--workers",
+        "{workers}",
+        "prowler_manager.asgi:application",
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the throughput of concurrent scan pollers between the sync (gunicorn) and async (uvicorn) modes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pollers", type=int, default=100, help="Clients polling at the same time")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds polling each mode")
+        parser.add_argument("--workers", type=int, default=2, help="Server worker processes of both modes")
+        parser.add_argument("--port", type=int, default=8100, help="Port where the servers are started")
+        parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=list(SERVERS), help="Modes to run")
+        parser.add_argument("--output", help="Path of the JSON file where the results are saved")
+
+    def handle(self, *args, **options):
+        scan = models.Scan.objects.order_by("-created_at").first()
+        if scan is None:
+            raise CommandError("No scans found, run `generate_load_data` first")
+
+        # What a client waiting for a scan polls
+        paths = [
+            reverse("scans-status", kwargs={"pk": scan.id}),
+            reverse("scans-detail", kwargs={"pk": scan.id}),
+            reverse("scan-findings-list", kwargs={"scan_pk": scan.id}),
+            reverse("scans-list"),
+        ]
+
+        results = {}
+        for mode in options["modes"]:
+            server = self.start_server(mode, options["port"], options["workers"], paths[0])
+
+            try:
+                results[mode] = self.poll(options["port"], paths, options["pollers"], options["duration"])
+
+            finally:
+                server.terminate()
+                server.wait()
+
+            self.stdout.write(
+                f"{mode}: {results[mode]['rps']:.1f} requests/s - p50 {results[mode]['p50_ms']:.1f} ms - "
+                f"p95 {results[mode]['p95_ms']:.1f} ms - {results[mode]['errors']} errors - "
+                f"{results[mode]['timeouts']} timeouts"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fp:
+                json.dump(results, fp, indent=4)
+            self.stdout.write(f"Results saved in {options['output']}")
+
+    def start_server(self, mode, port, workers, ready_path, timeout=30):
+        """Start the server of the mode as a subprocess, returning it once it answers"""
+
+        command = [part.format(port=port, workers=workers) for part in SERVERS[mode]]
+        env = os.environ | {"API_ASYNC": "true" if mode == "async" else "false"}
+        server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{ready_path}", timeout=1).close()
+                return server
+
+            except (URLError, ConnectionError):
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+
+        server.terminate()
+        raise CommandError(f"The {mode} server could not be started with: {' '.join(command)}")
+
+    def poll(self, port, paths, pollers, duration):
+        """Run `pollers` clients requesting the paths in turn during `duration` seconds, a new connection per request"""
+
+        deadline = time.monotonic() + duration
+
+        def poller(index):
+            latencies, errors, timeouts = [], 0, 0
+            for path in cycle(paths[index % len(paths) :] + paths[: index % len(paths)]):
+                if time.monotonic() >= deadline:
+                    return latencies, errors, timeouts
+
+                start = time.perf_counter()
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=30).read()
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                # A slow long-poll is a result of the benchmark, not a reason to abort it (`URLError` if connecting)
+                except (URLError, ConnectionError, TimeoutError) as error:
+                    if isinstance(error, TimeoutError) or isinstance(getattr(error, "reason", None), TimeoutError):
+                        timeouts += 1
+                    else:
+                        errors += 1
+
+        with ThreadPoolExecutor(max_workers=pollers) as executor:
+            poller_results = list(executor.map(poller, range(pollers)))
+
+        latencies = sorted(latency for poller_latencies, *_ in poller_results for latency in poller_latencies)
+        if not latencies:
+            raise CommandError("No request succeeded")
+
+        return {
+            "requests": len(latencies),
+            "errors": sum(errors for _, errors, _ in poller_results),
+            "timeouts": sum(timeouts for *_, timeouts in poller_results),
+            "rps": round(len(latencies) / duration, 1),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        }
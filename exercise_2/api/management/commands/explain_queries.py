@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api import models, seeding
+
+
+class Rollback(Exception):
+    """Raised for rolling back the seeded data"""
+
+
+class Command(BaseCommand):
+    help = "Show the plans and timings of the API listing and filtering queries, optionally on a seeded dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-scans", type=int, default=0, help="Completed scans to seed before explaining")
+        parser.add_argument("--seed-checks", type=int, default=100, help="Checks (and findings per scan) to seed")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data instead of rolling it back")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["seed_scans"]:
+                    findings = seeding.seed(
+                        checks=options["seed_checks"], scans=options["seed_scans"], prefix="Explain"
+                    )
+                    self.stdout.write(f"Seeded {options['seed_scans']} scans and {findings} findings")
+                    self.analyze()
+
+                self.explain_all()
+
+                if not options["keep"]:
+                    raise Rollback
+
+        except Rollback:
+            self.stdout.write("Seeded data rolled back")
+
+    def analyze(self):
+        """Refresh the planner statistics, otherwise the new rows are unknown to Postgres"""
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {models.Scan._meta.db_table}, {models.Finding._meta.db_table}")
+
+    def get_queries(self):
+        """The query shapes of the API list and filter paths"""
+
+        scan = models.Scan.objects.order_by("-created_at").first()
+        scan_id = scan.id if scan else None
+
+        return {
+            "scans_list": models.Scan.objects.order_by("-created_at", "-id")[:10],
+            "scans_active": models.Scan.objects.filter(
+                provider_id=scan.provider_id if scan else None,
+                status__in=[models.Scan.Status.PENDING, models.Scan.Status.IN_PROGRESS],
+            ).order_by(),
+            "findings_list": models.Finding.objects.filter(scan_id=scan_id).order_by("-created_at", "-id")[:10],
+            "findings_failed": models.Finding.objects.filter(scan_id=scan_id, success=False).order_by()[:10],
+            "findings_export": models.Finding.objects.filter(scan_id=scan_id).order_by("created_at", "id"),
+        }
+
+    def explain_all(self):
+        analyze = connection.vendor == "postgresql"
+
+        for name, queryset in self.get_queries().items():
+            plan = queryset.explain(analyze=True) if analyze else queryset.explain()
+            uses_index = "Index" in plan or "USING INDEX" in plan or "USING COVERING INDEX" in plan
+
+            start = time.perf_counter()
+            list(queryset)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            style = self.style.SUCCESS if uses_index else self.style.WARNING
+            self.stdout.write(style(f"{name}: {'index' if uses_index else 'no index'} - {elapsed:.2f} ms"))
+            self.stdout.write(f"    {plan.replace(chr(10), chr(10) + '    ')}")
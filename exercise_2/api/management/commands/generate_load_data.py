@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import seeding
+
+
+class Command(BaseCommand):
+    help = "Bulk create synthetic providers, checks, scans and findings for reproducing production-size loads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=3, help="Providers to create")
+        parser.add_argument("--checks", type=int, default=500, help="Checks per provider, and findings per scan")
+        parser.add_argument("--scans", type=int, default=100, help="Completed scans per provider")
+        parser.add_argument(
+            "--success-rate", type=float, help="Rate of succeeded findings, `CHECK_SUCCESS_RATE` default"
+        )
+        parser.add_argument("--prefix", default="Load", help="Prefix of the names, must be unique between runs")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows inserted at once")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        with transaction.atomic():
+            findings = seeding.seed(
+                providers=options["providers"],
+                checks=options["checks"],
+                scans=options["scans"],
+                success_rate=options["success_rate"],
+                prefix=options["prefix"],
+                batch_size=options["batch_size"],
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully created {options['providers']} providers, "
+                f"{options['providers'] * options['checks']} checks, "
+                f"{options['providers'] * options['scans']} scans and {findings} findings "
+                f"in {time.monotonic() - start:.1f} seconds!"
+            )
+        )
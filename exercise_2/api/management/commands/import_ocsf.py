@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ocsf
+
+
+class Command(BaseCommand):
+    help = "Import a Prowler OCSF JSON output file as a completed scan per provider, creating the missing checks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the OCSF JSON file")
+        parser.add_argument("--name", help="Name of the created scans, an `OCSF import` timestamp by default")
+        parser.add_argument("--comment", help="Comment of the created scans")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as fp:
+                scans = ocsf.import_ocsf(fp, options["name"], options["comment"])
+
+        except (OSError, ocsf.OCSFImportError) as error:
+            raise CommandError(error) from error
+
+        for scan in scans:
+            self.stdout.write(f"Imported scan {scan.id}: {scan.provider.name} - {scan.checks_executed} checks")
+
+        self.stdout.write(self.style.SUCCESS("Successfully imported the OCSF file!"))
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api import models
+
+COUNTERS = ["checks_total", "checks_executed", "checks_success", "checks_failed", "checks_carried"]
+
+
+class Command(BaseCommand):
+    help = "Backfill or reconcile the stored check counters and success of the scans with their checks and findings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scan_ids", nargs="*", help="Only reconcile these scans, all of them by default")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Scans reconciled per query")
+
+    def handle(self, *args, **options):
+        # All the fields read by `reconcile`, so no deferred field is loaded per scan
+        scans = models.Scan.objects.order_by("id").only(
+            "id", "provider_id", "schedule_id", "status", "success", "updated_at", *COUNTERS
+        )
+        if options["scan_ids"]:
+            scans = scans.filter(id__in=options["scan_ids"])
+
+        reconciled = 0
+        batch = []
+        for scan in scans.iterator(chunk_size=options["batch_size"]):
+            batch.append(scan)
+            if len(batch) >= options["batch_size"]:
+                reconciled += self.reconcile(batch)
+                batch = []
+
+        reconciled += self.reconcile(batch)
+        self.stdout.write(self.style.SUCCESS(f"Successfully reconciled {reconciled} scans!"))
+
+    def reconcile(self, scans):
+        """Recompute the counters of a batch of scans with one aggregated query, saving only the changed ones"""
+
+        findings = (
+            models.Finding.objects.filter(scan_id__in=[scan.id for scan in scans])
+            .order_by()
+            .values("scan_id")
+            .annotate(
+                checks_executed=Count("id"),
+                checks_success=Count("id", filter=Q(success=True)),
+                checks_failed=Count("id", filter=Q(success=False)),
+                checks_carried=Count("id", filter=Q(executed_at__isnull=False)),  # Only copied findings have it
+            )
+        )
+        counters_by_scan = {counters.pop("scan_id"): counters for counters in findings}
+        checks_totals = self.get_legacy_checks_totals(scans)
+
+        changed = []
+        for scan in scans:
+            counters = counters_by_scan.get(scan.id, dict.fromkeys(COUNTERS[1:], 0))
+            # The stored total is the checks the scan started with (e.g. the subset of its schedule), not the current
+            # checks of the provider, so it's only raised if more checks were executed
+            checks_total = scan.checks_total or checks_totals.get(scan.id, 0)
+            counters["checks_total"] = max(checks_total, counters["checks_executed"])
+
+            previous = [getattr(scan, field) for field in [*COUNTERS, "success"]]
+            for counter, value in counters.items():
+                setattr(scan, counter, value)
+            scan.success = scan.calculate_success()
+
+            if [getattr(scan, field) for field in [*COUNTERS, "success"]] != previous:
+                scan.updated_at = timezone.now()  # `bulk_update` doesn't handle `auto_now`
+                changed.append(scan)
+
+        models.Scan.objects.bulk_update(changed, [*COUNTERS, "success", "updated_at"])
+        return len(changed)
+
+    def get_legacy_checks_totals(self, scans):
+        """
+        `checks_total` of the scans without it (stored before it existed, so `0`), by scan, the checks of their schedule
+        if it has any, as `tasks.start_scan` does, else of their provider, with one query for each.
+        """
+
+        legacy = [scan for scan in scans if not scan.checks_total]
+        if not legacy:
+            return {}
+
+        schedule_ids = {scan.schedule_id for scan in legacy if scan.schedule_id is not None}
+        by_schedule = {}
+        if schedule_ids:
+            schedules = models.ScanSchedule.objects.filter(id__in=schedule_ids).annotate(checks_count=Count("checks"))
+            by_schedule = dict(schedules.values_list("id", "checks_count"))
+
+        checks = models.Check.objects.filter(provider_id__in={scan.provider_id for scan in legacy})
+        by_provider = dict(
+            checks.order_by().values("provider_id").annotate(count=Count("id")).values_list("provider_id", "count")
+        )
+
+        return {scan.id: by_schedule.get(scan.schedule_id) or by_provider.get(scan.provider_id, 0) for scan in legacy}
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="shards_finished",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="shards_total",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
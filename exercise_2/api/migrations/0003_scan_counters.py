@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0002_scan_shards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="checks_executed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="checks_failed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="checks_success",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="checks_total",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0003_scan_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="success",
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
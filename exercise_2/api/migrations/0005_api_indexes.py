@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:06
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Indexes are created concurrently, so big tables are not locked for writes while building them
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("api", "0004_scan_success"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="finding",
+            index=models.Index(fields=["scan", "-created_at", "-id"], name="finding_scan_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="finding",
+            index=models.Index(fields=["scan", "success"], name="finding_scan_success_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="scan",
+            index=models.Index(fields=["-created_at", "-id"], name="scan_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="scan",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "in_progress"])),
+                fields=["provider", "status"],
+                name="scan_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:11
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Created concurrently, so the findings table is not locked for writes while building it
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("api", "0005_api_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="finding",
+            index=models.Index(fields=["-created_at", "-id"], name="finding_created_idx"),
+        ),
+    ]
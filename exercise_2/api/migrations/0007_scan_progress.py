@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:18
+
+from django.db import migrations, models
+
+import api.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0006_finding_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="current_check",
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="progress_at",
+            field=api.models.DateTimeUTCField(blank=True, null=True),
+        ),
+    ]
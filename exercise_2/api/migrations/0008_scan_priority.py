@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0007_scan_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="priority",
+            field=models.CharField(
+                choices=[("low", "Low"), ("normal", "Normal"), ("high", "High")], default="normal", max_length=8
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:24
+
+import django.db.models.deletion
+
+from django.db import migrations, models
+
+import api.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0008_scan_priority"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="finding",
+            name="executed_at",
+            field=api.models.DateTimeUTCField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="baseline",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="incremental_scans",
+                to="api.scan",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:27
+
+import django.db.models.deletion
+
+from django.db import migrations, models
+
+import api.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0009_incremental_scans"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScanSchedule",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=api.models.generate_uuid7, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("created_at", api.models.DateTimeUTCField(auto_now_add=True)),
+                ("updated_at", api.models.DateTimeUTCField(auto_now=True)),
+                ("name", models.CharField(max_length=128)),
+                ("cron", models.CharField(max_length=64)),
+                (
+                    "priority",
+                    models.CharField(
+                        choices=[("low", "Low"), ("normal", "Normal"), ("high", "High")], default="normal", max_length=8
+                    ),
+                ),
+                ("enabled", models.BooleanField(default=True)),
+                ("next_run_at", api.models.DateTimeUTCField()),
+                ("last_run_at", api.models.DateTimeUTCField(blank=True, null=True)),
+                ("checks", models.ManyToManyField(blank=True, related_name="schedules", to="api.check")),
+                (
+                    "provider",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="schedules", to="api.provider"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["provider__name", "name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="scan",
+            name="schedule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="scans",
+                to="api.scanschedule",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scanschedule",
+            index=models.Index(condition=models.Q(("enabled", True)), fields=["next_run_at"], name="schedule_due_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="scanschedule",
+            unique_together={("provider", "name")},
+        ),
+    ]
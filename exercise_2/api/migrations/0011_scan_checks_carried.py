@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0010_scan_schedules"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="checks_carried",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,9 +1,13 @@
+from datetime import datetime
 from uuid import UUID
 
 import uuid_utils
 
+from croniter import croniter
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Case, F, When
+from django.utils import timezone
 
 
 # `uuid_utils` is missing needed Python's UUID properties
@@ -52,6 +56,42 @@ class Check(BaseModel):
         return f"{self.provider.name} - {self.name}"
 
 
+class ScanQuerySet(models.QuerySet):
+    def increment_counters(self, **deltas):
+        """Atomically add the given deltas to the scan counters, e.g. `increment_counters(checks_executed=10)`"""
+
+        if not any(deltas.values()):
+            return 0
+
+        updates = {counter: F(counter) + delta for counter, delta in deltas.items() if delta}
+        return self.update(**updates, updated_at=timezone.now())
+
+    def touch(self):
+        """Bump `updated_at`, e.g. when their findings are changed, so the conditional `GET` validators change too"""
+
+        return self.update(updated_at=timezone.now())
+
+    def record_progress(self, current_check, **deltas):
+        """Same as `increment_counters`, also storing the last executed check and when, for reporting the progress"""
+
+        now = timezone.now()
+        updates = {counter: F(counter) + delta for counter, delta in deltas.items() if delta}
+        return self.update(**updates, current_check=current_check, progress_at=now, updated_at=now)
+
+    def update_success(self):
+        """Store `success` from the counters, only completed scans with findings and none of them failed succeeded"""
+
+        return self.update(
+            success=Case(
+                When(status=Scan.Status.COMPLETED, checks_executed__gt=0, checks_failed=0, then=True),
+                When(status=Scan.Status.COMPLETED, then=False),
+                default=None,
+                output_field=models.BooleanField(null=True),
+            ),
+            updated_at=timezone.now(),
+        )
+
+
 class Scan(BaseModel):
     class Status(models.TextChoices):
         PENDING = "pending"
@@ -59,6 +99,14 @@ class Scan(BaseModel):
         COMPLETED = "completed"
         FAILED = "failed"
 
+    class Priority(models.TextChoices):
+        LOW = "low"
+        NORMAL = "normal"
+        HIGH = "high"
+
+    FINISHED_STATUSES = [Status.COMPLETED, Status.FAILED]
+    ACTIVE_STATUSES = [Status.PENDING, Status.IN_PROGRESS]
+
     provider = models.ForeignKey(
         Provider, related_name="scans", on_delete=models.CASCADE
     )  # Maybe if provider is deleted the scans should be saved
@@ -68,35 +116,80 @@ class Scan(BaseModel):
     finished_at = DateTimeUTCField(null=True, blank=True)
     name = models.CharField(max_length=128)
     comment = models.TextField(null=True, blank=True)
+    priority = models.CharField(max_length=8, choices=Priority.choices, default=Priority.NORMAL)  # See `SCAN_QUEUES`
+    # Incremental scans only run the checks whose result in the baseline scan can't be copied forward
+    baseline = models.ForeignKey(
+        "self", related_name="incremental_scans", null=True, blank=True, on_delete=models.SET_NULL
+    )
+    schedule = models.ForeignKey("ScanSchedule", related_name="scans", null=True, blank=True, on_delete=models.SET_NULL)
+    shards_total = models.PositiveSmallIntegerField(default=1)  # Number of jobs the scan checks are split into
+    shards_finished = models.PositiveSmallIntegerField(default=0)
+
+    # Counters are maintained by the scan task as findings are written, `reconcile_scans` command fixes any drift
+    checks_total = models.PositiveIntegerField(default=0)
+    checks_executed = models.PositiveIntegerField(default=0)
+    checks_success = models.PositiveIntegerField(default=0)
+    checks_failed = models.PositiveIntegerField(default=0)
+    checks_carried = models.PositiveIntegerField(default=0)  # Executed ones copied forward from the baseline scan
+
+    # Set when the scan finishes, `None` while not completed, only `True` if all its findings have succeeded
+    success = models.BooleanField(null=True, blank=True)
+
+    # Progress of a running scan, written with the counters when its findings are flushed, not per check
+    current_check = models.CharField(max_length=128, null=True, blank=True)
+    progress_at = DateTimeUTCField(null=True, blank=True)
+
+    objects = ScanQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
         unique_together = ["provider", "name"]
+        indexes = [
+            # Listing with the cursor pagination, newest first
+            models.Index(fields=["-created_at", "-id"], name="scan_created_idx"),
+            # Scans waiting or running are few, so a partial index keeps them cheap to find by provider
+            models.Index(
+                fields=["provider", "status"],
+                condition=models.Q(status__in=["pending", "in_progress"]),
+                name="scan_active_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.provider.name} - {self.status} - {self.name}"
 
     @property
-    def success(self):
-        """
-        Calculate if the scan was successful based on its findings.
+    def checks_pending(self):
+        return max(self.checks_total - self.checks_executed, 0)
 
-        Note:
-        Depending on the number of scans and findings this could be a costly operation, in real applications I'll prefer
-        to store the `success` field when a scan finishes, but just for showing the using of model properties is ok.
-        """
+    @property
+    def progress(self):
+        """Progress of a running scan, with an ETA extrapolated from the time per run check so far (copied take none)"""
 
-        # If not completed, None
-        if self.status != self.Status.COMPLETED:
+        if self.status != self.Status.IN_PROGRESS:
             return None
 
-        # If no findings, False
-        findings = self.findings.all()
-        if not findings.exists():
-            return False
+        eta = None
+        checks_run = self.checks_executed - self.checks_carried
+        if checks_run > 0 and self.started_at and self.progress_at:
+            time_per_check = (self.progress_at - self.started_at) / checks_run
+            eta = self.progress_at + time_per_check * self.checks_pending
+
+        return {
+            "checks_executed": self.checks_executed,
+            "checks_total": self.checks_total,
+            "percentage": round(100 * self.checks_executed / self.checks_total, 1) if self.checks_total else 0.0,
+            "current_check": self.current_check,
+            "eta": eta,
+        }
+
+    def calculate_success(self):
+        """Calculate if the scan was successful based on its counters, as `ScanQuerySet.update_success` does"""
+
+        if self.status != self.Status.COMPLETED:
+            return None
 
-        # Only True if all findings have succeeded
-        return all(finding.success for finding in findings)
+        return self.checks_executed > 0 and self.checks_failed == 0
 
 
 class Finding(BaseModel):
@@ -106,16 +199,77 @@ class Finding(BaseModel):
     )  # `check` is already used by Django
     success = models.BooleanField(default=False)
     comment = models.TextField(null=True, blank=True)
+    # Only set if copied forward from the baseline of an incremental scan, when its check was actually executed
+    executed_at = DateTimeUTCField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
         unique_together = ["scan", "check_parent"]
+        indexes = [
+            # Listing (newest first) and exporting (oldest first) the findings of a scan with the cursor pagination
+            models.Index(fields=["scan", "-created_at", "-id"], name="finding_scan_created_idx"),
+            # Filtering or counting the findings of a scan by `success`
+            models.Index(fields=["scan", "success"], name="finding_scan_success_idx"),
+            # Listing all the findings newest first in the admin
+            models.Index(fields=["-created_at", "-id"], name="finding_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.scan.provider.name} - {self.scan.name} - {self.check_parent.name} - {self.success}"
 
+    def update_scan_counters(self, previous_success):
+        """Move the finding between the scan `checks_success` and `checks_failed` counters if `success` changed"""
+
+        scans = Scan.objects.filter(id=self.scan_id)
+        # Other changes (e.g. `comment`) don't move the counters, but still change the validators of the findings
+        if self.success == previous_success:
+            scans.touch()
+            return
+
+        delta = 1 if self.success else -1
+        scans.increment_counters(checks_success=delta, checks_failed=-delta)
+        scans.update_success()
+
     def clean(self):
         """Validate providers of the scan and the check are the same"""
         super().clean()
         if self.scan.provider != self.check_parent.provider:
             raise ValidationError("`scan.provider` and `check.provider` must be the same.")
+
+
+class ScanSchedule(BaseModel):
+    provider = models.ForeignKey(Provider, related_name="schedules", on_delete=models.CASCADE)
+    name = models.CharField(max_length=128)
+    cron = models.CharField(max_length=64)  # e.g. `0 * * * *`, in UTC
+    checks = models.ManyToManyField(Check, related_name="schedules", blank=True)  # All the checks if none
+    priority = models.CharField(max_length=8, choices=Scan.Priority.choices, default=Scan.Priority.NORMAL)
+    enabled = models.BooleanField(default=True)
+
+    # Kept by `tasks.run_scan_schedules`, which creates the scans of the due schedules
+    next_run_at = DateTimeUTCField()
+    last_run_at = DateTimeUTCField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["provider__name", "name"]
+        unique_together = ["provider", "name"]
+        indexes = [
+            # Finding the due schedules every minute
+            models.Index(fields=["next_run_at"], condition=models.Q(enabled=True), name="schedule_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.provider.name} - {self.name}"
+
+    def get_next_run_at(self, after):
+        return croniter(self.cron, after).get_next(datetime)
+
+    # The next run is always after the last change, so a changed `cron` or a re-enabled schedule doesn't catch up
+    def save(self, *args, **kwargs):
+        self.next_run_at = self.get_next_run_at(timezone.now())
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        """Validate the cron expression"""
+        super().clean()
+        if not croniter.is_valid(self.cron):
+            raise ValidationError({"cron": "Not a valid cron expression."})
@@ -0,0 +1,209 @@
+import json
+
+from datetime import UTC
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import catalog, models
+from api.utils import logging
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class OCSFImportError(ValueError):
+    """Raised when the file is not a JSON array of OCSF findings"""
+
+
+def iter_json_array(fp, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the objects of a top-level JSON array, reading the text file-like `fp` by chunks.
+
+    Note:
+    Only the object being decoded and the last chunk are kept in memory, so huge files are parsed in bounded memory
+    without any extra dependency. Array items must be objects, as with Prowler OCSF JSON output.
+    """
+
+    def read():
+        try:
+            return fp.read(chunk_size)
+
+        except UnicodeDecodeError as error:
+            raise OCSFImportError(f"The file is not UTF-8 encoded: {error}") from error
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+
+        if not buffer:
+            if eof:
+                raise OCSFImportError("Unexpected end of file, the JSON array is not closed")
+
+            buffer = read()
+            eof = not buffer
+            continue
+
+        if not started:
+            if buffer[0] != "[":
+                raise OCSFImportError("The file must contain a JSON array of findings")
+
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        if buffer[0] == "]":
+            return
+
+        if buffer[0] == ",":
+            buffer = buffer[1:]
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer)
+
+        # The object is not complete yet, so keep reading
+        except json.JSONDecodeError as error:
+            if eof:
+                raise OCSFImportError(f"Invalid JSON: {error}") from error
+
+            chunk = read()
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        if not isinstance(item, dict):
+            raise OCSFImportError("The JSON array items must be objects")
+
+        yield item
+        buffer = buffer[end:]
+
+
+class OCSFImporter:
+    """
+    Import Prowler OCSF findings as one completed scan per provider, with a finding per check.
+
+    Note:
+    OCSF has one finding per check and resource, while here a finding is unique per scan and check, so a check succeeds
+    only if none of its OCSF findings has a `FAIL` status. Only a result per check is kept in memory, so memory is
+    bounded by the number of checks, not by the file size.
+    """
+
+    def __init__(self, scan_name=None, comment=None):
+        self.scan_name = scan_name or f"OCSF import {timezone.now():%Y-%m-%d %H:%M:%S}"
+        if len(self.scan_name) > models.Scan._meta.get_field("name").max_length:
+            raise OCSFImportError("The scan name is too long")
+
+        self.comment = comment
+        self.providers = {}  # Provider cache by OCSF `cloud.provider`
+        self.results = {}  # `{provider_id: {event_code: success}}`
+        self.times = {}  # `{provider_id: [first finding time, last finding time]}`
+
+    def add(self, finding):
+        try:
+            provider_name = finding["cloud"]["provider"]
+            event_code = finding["metadata"]["event_code"]
+            status_code = finding["status_code"]
+
+        except (KeyError, TypeError) as error:
+            raise OCSFImportError(f"Missing OCSF finding field: {error}") from error
+
+        provider = self.get_provider(provider_name)
+        results = self.results.setdefault(provider.id, {})
+        results[event_code] = results.get(event_code, True) and status_code != "FAIL"
+
+        finding_time = parse_datetime(finding.get("time_dt") or "")
+        if finding_time is not None:
+            if timezone.is_aware(finding_time):
+                finding_time = finding_time.astimezone(UTC).replace(tzinfo=None)  # Only UTC timestamps in the backend
+            times = self.times.setdefault(provider.id, [finding_time, finding_time])
+            times[0], times[1] = min(times[0], finding_time), max(times[1], finding_time)
+
+    def get_provider(self, name):
+        if name not in self.providers:
+            provider = models.Provider.objects.filter(name__iexact=name).first()
+            self.providers[name] = provider or models.Provider.objects.create(name=name.upper())
+
+        return self.providers[name]
+
+    def get_checks(self, provider_id, event_codes):
+        """Get the checks of the provider by name, creating the missing ones at once"""
+
+        checks = {
+            check.name: check for check in models.Check.objects.filter(provider_id=provider_id, name__in=event_codes)
+        }
+        missing = [models.Check(provider_id=provider_id, name=name) for name in event_codes if name not in checks]
+        if missing:
+            models.Check.objects.bulk_create(missing, batch_size=settings.FINDINGS_BATCH_SIZE)
+            catalog.bump_version(provider_id)  # `bulk_create` sends no signals
+
+        return checks | {check.name: check for check in missing}
+
+    def save(self):
+        """Create a completed scan per provider with its findings, returns the created scans"""
+
+        scans = []
+        providers = {provider.id: provider for provider in self.providers.values()}  # `aws` and `AWS` are the same
+        if models.Scan.objects.filter(provider_id__in=providers, name=self.scan_name).exists():
+            raise OCSFImportError(f"A scan named {self.scan_name!r} already exists for a provider")
+
+        for provider in providers.values():
+            results = self.results[provider.id]
+            checks = self.get_checks(provider.id, list(results))
+            started_at, finished_at = self.times.get(provider.id, [None, None])
+            checks_success = sum(results.values())
+
+            scan = models.Scan(
+                provider=provider,
+                name=self.scan_name,
+                comment=self.comment,
+                status=models.Scan.Status.COMPLETED,
+                started_at=started_at,
+                finished_at=finished_at,
+                checks_total=models.Check.objects.filter(provider=provider).count(),
+                checks_executed=len(results),
+                checks_success=checks_success,
+                checks_failed=len(results) - checks_success,
+                shards_finished=1,
+            )
+            scan.success = scan.calculate_success()
+
+            # Scan names are unique per provider, a concurrent import may have created the same one meanwhile
+            try:
+                scan.save()
+
+            except IntegrityError as error:
+                raise OCSFImportError(f"A scan named {self.scan_name!r} already exists for a provider") from error
+
+            findings = (
+                models.Finding(scan=scan, check_parent=checks[event_code], success=success)
+                for event_code, success in results.items()
+            )
+            models.Finding.objects.bulk_create(findings, batch_size=settings.FINDINGS_BATCH_SIZE)
+
+            logger.info(f"({scan.id}) Imported {len(results)} OCSF checks for provider {provider.name}")
+            scans.append(scan)
+
+        return scans
+
+
+def import_ocsf(fp, scan_name=None, comment=None):
+    """Import the OCSF JSON text file-like `fp`, all or nothing, returns the created scans"""
+
+    importer = OCSFImporter(scan_name, comment)
+
+    with transaction.atomic():
+        for finding in iter_json_array(fp):
+            importer.add(finding)
+
+        if not importer.results:
+            raise OCSFImportError("The file has no findings")
+
+        return importer.save()
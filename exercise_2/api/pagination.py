@@ -0,0 +1,121 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+
+class CreatedAtCursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination on `(created_at, id)`, newest first, so any page costs the same as the first one.
+
+    Note:
+    DRF cursors only filter on the first ordering field, falling back to offsets for its ties (e.g. bulk created rows),
+    so here the cursor position is the whole `(created_at, id)` key, always unique, and pages are filtered by it without
+    any offset. The total `count` is one `COUNT(*)` per request, it can be skipped with `?count=false` on huge tables.
+    The page size can be set with `?limit=`, as with the default `LimitOffsetPagination`.
+    """
+
+    ordering = ("-created_at", "-id")  # `id` is an UUIDv7, so it follows `created_at` and breaks its ties
+    page_size_query_param = "limit"
+    max_page_size = 1000
+    count_query_param = "count"
+    position_separator = "|"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, "true").lower() not in ("false", "0"):
+            self.count = queryset.count()
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor is not None else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = self.filter_keyset(queryset, current_position, reverse)
+
+        # An extra row is fetched for knowing if there is a following page
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        # Same next and previous positions as DRF, without offsets, as positions are unique
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = True, current_position
+            self.has_previous, self.previous_position = following_position is not None, following_position
+
+        else:
+            self.has_next, self.next_position = following_position is not None, following_position
+            self.has_previous, self.previous_position = current_position is not None, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def filter_keyset(self, queryset, position, reverse):
+        """Rows after the `position` in the ordering (before it if `reverse`), e.g. `(created_at, id) < (c, i)`"""
+
+        values = position.split(self.position_separator)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Expanded as `created_at < c OR (created_at = c AND id < i)`, as Django has no row comparisons
+        keyset_filter, equal = Q(), {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            keyset_filter |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        try:
+            return queryset.filter(keyset_filter)
+
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [field.lstrip("-") for field in ordering]
+        values = [instance[field] if isinstance(instance, dict) else getattr(instance, field) for field in fields]
+        return self.position_separator.join(str(value) for value in values)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of `paginate_queryset`, for the async views.
+
+        Note:
+        The cursor logic of DRF is sync, so the page is fetched in the thread of the request, as the async ORM does.
+        """
+
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data}
+        if self.count is not None:
+            response = {"count": self.count, **response}
+
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
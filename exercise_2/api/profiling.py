@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.contrib import admin
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from api import models, urls
+
+# Model of the `pk` URL kwarg of each route basename, nested routes also get their parents
+ROUTE_MODELS = {
+    "providers": models.Provider,
+    "provider-checks": models.Check,
+    "provider-schedules": models.ScanSchedule,
+    "scans": models.Scan,
+    "scan-findings": models.Finding,
+}
+
+
+def measure(func, repeat=1):
+    """
+    Run `func` `repeat` times, returning the SQL queries of the last run and the median wall time in milliseconds.
+
+    Note:
+    Streaming responses must be consumed inside `func`, otherwise their queries and time are not measured.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return {"queries": len(context.captured_queries), "ms": round(statistics.median(timings), 3)}
+
+
+def get_url(client, url):
+    """`GET` the URL with the Django test client, consuming streaming responses, returns the status code"""
+
+    response = client.get(url)
+    if response.streaming:
+        b"".join(response.streaming_content)
+
+    return response.status_code
+
+
+def get_routes(scan):
+    """Build the URL of every `GET` route of `api.urls`, using the given scan and its related objects"""
+
+    finding = scan.findings.order_by("created_at").first()
+    objects = {
+        models.Provider: scan.provider,
+        models.Check: finding.check_parent if finding else scan.provider.checks.first(),
+        models.ScanSchedule: scan.provider.schedules.first(),
+        models.Scan: scan,
+        models.Finding: finding,
+    }
+    parents = {"provider_pk": objects[models.Provider], "scan_pk": scan}
+
+    routes = {}
+    for pattern in urls.urlpatterns:
+        kwargs_names = set(pattern.pattern.regex.groupindex)
+        actions = getattr(pattern.callback, "actions", {"get": "list"})
+        if not isinstance(pattern, URLPattern) or "format" in kwargs_names or "get" not in actions:
+            continue
+
+        kwargs = {name: parents[name].pk for name in kwargs_names if name in parents}
+        if "pk" in kwargs_names:
+            instance = objects[ROUTE_MODELS[pattern.name.rsplit("-", 1)[0]]]
+            if instance is None:
+                continue
+            kwargs["pk"] = instance.pk
+
+        routes[pattern.name] = reverse(pattern.name, kwargs=kwargs)
+
+    return routes
+
+
+def get_admin_routes():
+    """Build the URL of the change list of every `api` model registered in the admin"""
+
+    return {
+        f"admin-{model._meta.model_name}-changelist": reverse(f"admin:api_{model._meta.model_name}_changelist")
+        for model in admin.site._registry
+        if model._meta.app_label == "api"
+    }
@@ -0,0 +1,139 @@
+import random
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api import models
+
+
+class CheckExecutionError(Exception):
+    """Raised when a check could not be completed, it fails the whole scan"""
+
+    def __init__(self, check):
+        super().__init__(f"Check {check.name} could not be completed")
+        self.check = check
+
+
+def run_check(check):
+    """Simulate a check run: a delay, a possible exception and a success/failure condition"""
+
+    time.sleep(settings.CHECK_SLEEP_TIME)
+
+    if random.random() < settings.CHECK_EXCEPTION_RATE:
+        raise CheckExecutionError(check)
+
+    return random.random() < settings.CHECK_SUCCESS_RATE
+
+
+def execute_checks(checks):
+    """
+    Run the given checks in a bounded thread pool, yielding `(check, success)` as soon as each one finishes.
+
+    Note:
+    Threads only run the checks, they never touch the database, so the caller keeps using its own connection. When a
+    check raises `CheckExecutionError`, the pending checks are cancelled and the exception is propagated (fail-fast).
+    """
+
+    with ThreadPoolExecutor(max_workers=settings.CHECK_CONCURRENCY) as executor:
+        futures = {executor.submit(run_check, check): check for check in checks}
+
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FindingBuffer:
+    """
+    Buffer the findings of a scan and insert them with `bulk_create`, flushing when `FINDINGS_BATCH_SIZE` findings are
+    waiting or when `FINDINGS_FLUSH_INTERVAL` seconds have passed since the last flush.
+
+    Note:
+    Used as a context manager, the remaining findings are flushed on exit, so they are always saved before the scan
+    status is updated. The scan counters and progress are updated in the same transaction as the findings are inserted,
+    so flushing also throttles the progress writes.
+    """
+
+    def __init__(self, scan):
+        self.scan = scan
+        self.findings = []
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def add(self, check, success):
+        self.findings.append(models.Finding(scan=self.scan, check_parent=check, success=success))
+
+        is_full = len(self.findings) >= settings.FINDINGS_BATCH_SIZE
+        is_stale = time.monotonic() - self.last_flush >= settings.FINDINGS_FLUSH_INTERVAL
+        if is_full or is_stale:
+            self.flush()
+
+    def flush(self):
+        if self.findings:
+            checks_success = sum(finding.success for finding in self.findings)
+
+            with transaction.atomic():
+                models.Finding.objects.bulk_create(self.findings, batch_size=settings.FINDINGS_BATCH_SIZE)
+                models.Scan.objects.filter(id=self.scan.id).record_progress(
+                    self.findings[-1].check_parent.name,
+                    checks_executed=len(self.findings),
+                    checks_success=checks_success,
+                    checks_failed=len(self.findings) - checks_success,
+                )
+
+        self.findings = []
+        self.last_flush = time.monotonic()
+
+
+def carry_forward_findings(scan, checks):
+    """
+    Copy forward the findings of the baseline scan that can be reused by an incremental scan, returning the checks that
+    still have to be executed.
+
+    Note:
+    A check is executed again if it failed or has no finding in the baseline, if it was updated after its result, or
+    if its result is older than `INCREMENTAL_SCAN_TTL` seconds. Copied findings keep when their check was executed in
+    `executed_at`, so a result is not copied forward from scan to scan forever.
+    """
+
+    checks_by_id = {check.id: check for check in checks}
+    min_executed_at = timezone.now() - timedelta(seconds=settings.INCREMENTAL_SCAN_TTL)
+
+    baseline_findings = (
+        models.Finding.objects.filter(scan_id=scan.baseline_id, success=True)
+        .annotate(result_at=Coalesce("executed_at", "created_at"))
+        .filter(result_at__gte=min_executed_at, check_parent__updated_at__lte=F("result_at"))
+        .values_list("check_parent_id", "result_at")
+    )
+    findings = [
+        models.Finding(scan=scan, check_parent=checks_by_id[check_id], success=True, executed_at=result_at)
+        for check_id, result_at in baseline_findings
+        if check_id in checks_by_id
+    ]
+
+    if findings:
+        with transaction.atomic():
+            models.Finding.objects.bulk_create(findings, batch_size=settings.FINDINGS_BATCH_SIZE)
+            models.Scan.objects.filter(id=scan.id).record_progress(
+                findings[-1].check_parent.name,
+                checks_executed=len(findings),
+                checks_success=len(findings),
+                checks_carried=len(findings),
+            )
+
+    carried_check_ids = {finding.check_parent_id for finding in findings}
+    return [check for check in checks if check.id not in carried_check_ids]
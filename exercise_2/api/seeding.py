@@ -0,0 +1,96 @@
+import random
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from api import catalog, models
+
+
+def bulk_insert(model, objs, batch_size):
+    """
+    Insert the objects by batches, with `COPY` on Postgres (way faster for millions of rows) or `bulk_create` otherwise.
+
+    Note:
+    As `bulk_create`, it doesn't call `save()` nor send signals, but `auto_now` fields are filled by `pre_save`.
+    """
+
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            _insert(model, batch)
+            batch = []
+
+    _insert(model, batch)
+
+
+def _insert(model, objs):
+    if not objs:
+        return
+
+    if connection.vendor != "postgresql":
+        model.objects.bulk_create(objs)
+        return
+
+    fields = model._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor, cursor.copy(f"COPY {model._meta.db_table} ({columns}) FROM STDIN") as copy:
+        for obj in objs:
+            copy.write_row([field.get_db_prep_save(field.pre_save(obj, add=True), connection) for field in fields])
+
+
+def seed(providers=1, checks=100, scans=10, success_rate=None, prefix="Seed", batch_size=None):
+    """
+    Bulk create synthetic providers, each one with its checks and completed scans with a finding per check.
+
+    Note:
+    The scan counters and `success` are set as the scan task would do, so the seeded data looks like real scans.
+    Findings are generated lazily, so memory is bounded by `batch_size`. Returns the number of created findings.
+    """
+
+    success_rate = settings.CHECK_SUCCESS_RATE if success_rate is None else success_rate
+    batch_size = batch_size or settings.FINDINGS_BATCH_SIZE
+    now = timezone.now()
+    findings_total = 0
+
+    for provider_index in range(providers):
+        provider = models.Provider.objects.create(name=f"{prefix} {provider_index}"[:32])
+
+        provider_checks = [models.Check(provider=provider, name=f"{prefix} check {index}") for index in range(checks)]
+        bulk_insert(models.Check, provider_checks, batch_size)
+        catalog.bump_version(provider.id)
+
+        # Results are decided upfront, so the scan counters are known before inserting its findings
+        provider_scans = []
+        results = {}
+        for scan_index in range(scans):
+            scan_results = [random.random() < success_rate for _ in provider_checks]
+            scan = models.Scan(
+                provider=provider,
+                name=f"{prefix} scan {scan_index}",
+                status=models.Scan.Status.COMPLETED,
+                started_at=now,
+                finished_at=now,
+                checks_total=checks,
+                checks_executed=checks,
+                checks_success=sum(scan_results),
+                checks_failed=checks - sum(scan_results),
+                shards_finished=1,
+            )
+            scan.success = scan.calculate_success()
+            provider_scans.append(scan)
+            results[scan.id] = scan_results
+
+        bulk_insert(models.Scan, provider_scans, batch_size)
+
+        findings = (
+            models.Finding(scan=scan, check_parent=check, success=success)
+            for scan in provider_scans
+            for check, success in zip(provider_checks, results.pop(scan.id), strict=True)
+        )
+        bulk_insert(models.Finding, findings, batch_size)
+        findings_total += checks * scans
+
+    return findings_total
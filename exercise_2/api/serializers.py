@@ -1,3 +1,4 @@
+from croniter import croniter
 from django.conf import settings
 from rest_framework import serializers
 from rest_framework_nested import serializers as serializers_nested
@@ -9,6 +10,36 @@ BASE_FIELDS = ["id", "created_at", "updated_at"]
 # Note: URLs has been added to the serializers for easing navigation while browsing the API
 
 
+def get_requested_fields(request, names):
+    """
+    The field `names` to output for the request, all of them unless reading with `?fields=` (only those) or `?omit=`
+    (all but those), both comma separated.
+    """
+
+    names = list(names)
+    if request is None or request.method not in ["GET", "HEAD"]:
+        return names
+
+    fields = request.query_params.get("fields")
+    if fields:
+        names = [name for name in names if name in fields.split(",")]
+
+    omit = request.query_params.get("omit")
+    if omit:
+        names = [name for name in names if name not in omit.split(",")]
+
+    return names
+
+
+class SparseFieldsMixin:
+    """Mixin for only building the fields requested with `?fields=` or `?omit=`, see `get_requested_fields`"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = get_requested_fields(self.context.get("request"), fields)
+        return {name: field for name, field in fields.items() if name in requested}
+
+
 class URLFieldsMixin:
     """Mixin for removing the URLs from the output when not in DEBUG or when the requested format is JSON and not API"""
 
@@ -25,7 +56,7 @@ class URLFieldsMixin:
         return representation
 
 
-class ProviderSerializer(URLFieldsMixin, serializers.HyperlinkedModelSerializer):
+class ProviderSerializer(SparseFieldsMixin, URLFieldsMixin, serializers.HyperlinkedModelSerializer):
     checks_total = serializers.IntegerField(read_only=True)
     checks_url = serializers.HyperlinkedIdentityField(
         view_name="provider-checks-list", read_only=True, lookup_url_kwarg="provider_pk"
@@ -43,11 +74,12 @@ class ProviderSerializer(URLFieldsMixin, serializers.HyperlinkedModelSerializer)
     url_fields = Meta.url_fields
 
 
-class CheckSerializer(URLFieldsMixin, serializers_nested.NestedHyperlinkedModelSerializer):
+class CheckSerializer(SparseFieldsMixin, URLFieldsMixin, serializers_nested.NestedHyperlinkedModelSerializer):
     provider_url = serializers.HyperlinkedRelatedField(source="provider", read_only=True, view_name="providers-detail")
 
+    # `provider_id` instead of `provider__pk`, so building the URLs doesn't query the provider of every check
     parent_lookup_kwargs = {
-        "provider_pk": "provider__pk",
+        "provider_pk": "provider_id",
     }
 
     class Meta:
@@ -62,21 +94,85 @@ class CheckSerializer(URLFieldsMixin, serializers_nested.NestedHyperlinkedModelS
     url_fields = Meta.url_fields
 
 
-class ScanSerializer(URLFieldsMixin, serializers.ModelSerializer):
-    def __init__(self, *args, **kwargs):  # Making `provider_id` read-only when updating
+class CheckBulkSerializer(serializers.Serializer):
+    names = serializers.ListField(child=serializers.CharField(max_length=128), allow_empty=False)
+    prune = serializers.BooleanField(default=False)
+
+    # Repeated names are the same check
+    def validate_names(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ScanScheduleSerializer(SparseFieldsMixin, URLFieldsMixin, serializers_nested.NestedHyperlinkedModelSerializer):
+    check_ids = serializers.PrimaryKeyRelatedField(
+        many=True, source="checks", queryset=models.Check.objects.all(), required=False
+    )  # All the checks of the provider if empty
+    provider_url = serializers.HyperlinkedRelatedField(source="provider", read_only=True, view_name="providers-detail")
+
+    # `provider_id` instead of `provider__pk`, so building the URLs doesn't query the provider of every schedule
+    parent_lookup_kwargs = {
+        "provider_pk": "provider_id",
+    }
+
+    class Meta:
+        model = models.ScanSchedule
+        url_fields = ["url", "provider_url"]
+        fields = (
+            BASE_FIELDS
+            + ["provider_id", "name", "cron", "check_ids", "priority", "enabled", "next_run_at", "last_run_at"]
+            + url_fields
+        )
+        read_only_fields = BASE_FIELDS + ["provider_id", "next_run_at", "last_run_at"] + url_fields
+        extra_kwargs = {
+            "url": {"view_name": "provider-schedules-detail", "read_only": True},
+        }
+
+    url_fields = Meta.url_fields
+
+    def validate_cron(self, value):
+        if not croniter.is_valid(value):
+            raise serializers.ValidationError("Not a valid cron expression")
+
+        return value
+
+    # Checks must be of the provider on the URL
+    def validate_check_ids(self, value):
+        provider_id = str(self.context["view"].kwargs["provider_pk"])
+        if any(str(check.provider_id) != provider_id for check in value):
+            raise serializers.ValidationError("Must be checks of the same provider")
+
+        return value
+
+
+class ScanProgressSerializer(serializers.Serializer):
+    checks_executed = serializers.IntegerField()
+    checks_total = serializers.IntegerField()
+    percentage = serializers.FloatField()
+    current_check = serializers.CharField(allow_null=True)
+    eta = serializers.DateTimeField(allow_null=True)
+
+
+class ScanSerializer(SparseFieldsMixin, URLFieldsMixin, serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):  # Making `provider_id`, `priority` and `baseline_id` read-only when updating
         super().__init__(*args, **kwargs)
 
         if self.instance:
-            self.fields["provider_id"].read_only = True
+            for name in ["provider_id", "priority", "baseline_id"]:
+                if name in self.fields:  # Not if left out with `?fields=` or `?omit=`
+                    self.fields[name].read_only = True
 
     provider_id = serializers.UUIDField()
+    baseline_id = serializers.UUIDField(required=False, allow_null=True)  # Makes the scan incremental
+    schedule_id = serializers.UUIDField(read_only=True)  # Only for the scans created by a schedule
 
-    # As in `models.Scan.success`, this is costly operation, just for showing calculated fields in views and serializers
+    # Counters are stored in `models.Scan`, `checks_pending` is calculated from them
     checks_total = serializers.IntegerField(read_only=True)
     checks_executed = serializers.IntegerField(read_only=True)
     checks_pending = serializers.IntegerField(read_only=True)
     checks_success = serializers.IntegerField(read_only=True)
     checks_failed = serializers.IntegerField(read_only=True)
+    checks_carried = serializers.IntegerField(read_only=True)  # Copied forward from the baseline scan
+    progress = ScanProgressSerializer(read_only=True)  # Only while `in_progress`, `None` otherwise
     status_url = serializers.HyperlinkedIdentityField(view_name="scans-status", read_only=True, lookup_url_kwarg="pk")
 
     findings_url = serializers.HyperlinkedIdentityField(
@@ -96,12 +192,19 @@ class ScanSerializer(URLFieldsMixin, serializers.ModelSerializer):
                 "finished_at",
                 "name",
                 "comment",
+                "priority",
+                "baseline_id",
+                "schedule_id",
                 "checks_total",
                 "checks_executed",
                 "checks_pending",
                 "checks_success",
                 "checks_failed",
+                "checks_carried",
                 "success",
+                "progress",
+                "shards_total",
+                "shards_finished",
             ]
             + url_fields
         )
@@ -117,7 +220,11 @@ class ScanSerializer(URLFieldsMixin, serializers.ModelSerializer):
                 "checks_pending",
                 "checks_success",
                 "checks_failed",
+                "checks_carried",
                 "success",
+                "progress",
+                "shards_total",
+                "shards_finished",
             ]
             + url_fields
         )
@@ -127,20 +234,48 @@ class ScanSerializer(URLFieldsMixin, serializers.ModelSerializer):
 
     url_fields = Meta.url_fields
 
+    # The baseline of an incremental scan must be a completed scan of the same provider
+    def validate(self, attrs):
+        baseline_id = attrs.get("baseline_id")
+        if baseline_id is not None:
+            is_valid_baseline = models.Scan.objects.filter(
+                id=baseline_id, provider_id=attrs["provider_id"], status=models.Scan.Status.COMPLETED
+            ).exists()
+            if not is_valid_baseline:
+                raise serializers.ValidationError({"baseline_id": "Must be a completed scan of the same provider"})
+
+        return attrs
+
+
+class FindingBulkUpdateSerializer(serializers.Serializer):
+    # The findings to update, by `ids` and/or filtered by `success` and `check_ids`
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    success = serializers.BooleanField(required=False)
+    check_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    comment = serializers.CharField(allow_null=True, allow_blank=True)
+
+    # Updating all the findings of the scan must not be the result of a forgotten filter
+    def validate(self, attrs):
+        if not attrs.keys() & {"ids", "success", "check_ids"}:
+            raise serializers.ValidationError("`ids` or a filter (`success` or `check_ids`) must be given")
+
+        return attrs
+
 
-class FindingSerializer(URLFieldsMixin, serializers_nested.NestedHyperlinkedModelSerializer):
+class FindingSerializer(SparseFieldsMixin, URLFieldsMixin, serializers_nested.NestedHyperlinkedModelSerializer):
     check_id = serializers.UUIDField(read_only=True, source="check_parent_id")
     scan_url = serializers.HyperlinkedRelatedField(source="scan", read_only=True, view_name="scans-detail")
 
+    # `scan_id` instead of `scan__pk`, so building the URLs doesn't query the scan of every finding
     parent_lookup_kwargs = {
-        "scan_pk": "scan__pk",
+        "scan_pk": "scan_id",
     }
 
     class Meta:
         model = models.Finding
         url_fields = ["url", "scan_url"]
-        fields = BASE_FIELDS + ["scan_id", "check_id", "success", "comment"] + url_fields
-        read_only_fields = BASE_FIELDS + ["scan_id", "check_id", "success"] + url_fields
+        fields = BASE_FIELDS + ["scan_id", "check_id", "success", "comment", "executed_at"] + url_fields
+        read_only_fields = BASE_FIELDS + ["scan_id", "check_id", "success", "executed_at"] + url_fields
         extra_kwargs = {
             "url": {"view_name": "scan-findings-detail", "read_only": True},
         }
@@ -1,64 +1,320 @@
 import random
-import time
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from procrastinate.contrib.django import app
+from procrastinate.exceptions import AlreadyEnqueued
 
-from api import models
+from api import events, models
+from api.scanner import CheckExecutionError, FindingBuffer, carry_forward_findings, execute_checks
 from api.utils import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Queue and job priority (higher runs first) of each scan priority, so workers can be dedicated with `--queues`
+SCAN_QUEUES = {
+    models.Scan.Priority.HIGH: ("scans_high", 10),
+    models.Scan.Priority.NORMAL: ("scans", 0),
+    models.Scan.Priority.LOW: ("scans_low", -10),
+}
+
+
+def get_scan_locks(scan):
+    """
+    Lock of each shard job of the given scan, limiting the jobs of its provider running at the same time.
+
+    Note:
+    With `SCAN_PROVIDER_CONCURRENCY` set to N, the jobs of a provider share N locks, and `procrastinate` runs only one
+    job per lock at a time, the higher priority first. The locks are assigned round-robin after the active scans of the
+    provider, so consecutive scans don't wait on the same lock. Without limit, jobs have no lock.
+    """
+
+    limit = settings.SCAN_PROVIDER_CONCURRENCY
+    if limit <= 0:
+        return [None] * scan.shards_total
+
+    first_slot = (
+        models.Scan.objects.filter(provider_id=scan.provider_id, status__in=models.Scan.ACTIVE_STATUSES)
+        .exclude(id=scan.id)
+        .count()
+    )
+
+    return [f"provider-{scan.provider_id}-{(first_slot + shard) % limit}" for shard in range(scan.shards_total)]
+
+
+def get_scan_queueing_lock(scan):
+    """Queueing lock of the scans of the same provider and priority, only one of them can be waiting to start"""
+
+    return f"scan-{scan.provider_id}-{scan.priority}"
+
+
+def defer_scan(scan, coalesce=False):
+    """
+    Defer the jobs running the given scan, one per shard, so a big scan can use several worker slots.
+
+    Note:
+    With `coalesce`, its first job takes the queueing lock of the scan, raising `AlreadyEnqueued` if another scan of the
+    same provider and priority is still waiting to start.
+    """
+
+    queue, priority = SCAN_QUEUES[scan.priority]
+    locks = get_scan_locks(scan)
+    shards = [{"scan_id": str(scan.id), "shard": shard} for shard in range(scan.shards_total)]
+
+    if coalesce:
+        job = start_scan.configure(
+            queue=queue,
+            priority=priority,
+            lock=locks[0],
+            queueing_lock=get_scan_queueing_lock(scan),
+        )
+        job.defer(**shards[0])
+        locks, shards = locks[1:], shards[1:]
+
+    # Jobs are deferred at once, in one batch per lock
+    shards_by_lock = {}
+    for lock, shard in zip(locks, shards):
+        shards_by_lock.setdefault(lock, []).append(shard)
+
+    for lock, lock_shards in shards_by_lock.items():
+        job = start_scan.configure(queue=queue, priority=priority, lock=lock)
+        job.batch_defer(*lock_shards)
+
+
+def get_shard_checks(checks, shard, shards_total):
+    """
+    Checks run by the given shard of a scan, partitioned by check ID, so a check is always run by the same shard even
+    if checks are added or removed between the start of the shards.
+    """
+
+    return [check for check in checks if check.id.int % shards_total == shard]
+
+
+def finish_shard(scan_id, failed_reason=None):
+    """
+    Fan-in of the scan shards: the first failing shard fails the scan, and the last finished shard completes it.
+
+    Note:
+    The scan row is locked, so concurrent shards finishing at the same time see the right `shards_finished` value. A
+    retried shard (e.g. by `reap_stalled_scans`) may finish twice, so `shards_finished` is capped to `shards_total`.
+    """
+
+    with transaction.atomic():
+        scan = models.Scan.objects.select_for_update().get(id=scan_id)
+        previous_status = scan.status
+        scan.shards_finished = min(scan.shards_finished + 1, scan.shards_total)
+
+        if scan.status == models.Scan.Status.IN_PROGRESS:
+            if failed_reason is not None:
+                scan.status = models.Scan.Status.FAILED
+                scan.failed_reason = failed_reason
+                scan.finished_at = timezone.now()
+
+            elif scan.shards_finished >= scan.shards_total:
+                scan.status = models.Scan.Status.COMPLETED
+                scan.finished_at = timezone.now()
+
+        scan.success = scan.calculate_success()
+        scan.save()
+
+        if scan.status != previous_status:
+            events.notify_scan_status(scan.id, scan.status)
+
+    return scan
+
+
 @app.task
-def start_scan(scan_id):
-    """Starts a scan for the given scan ID"""
+def start_scan(scan_id, shard=0):
+    """Starts a scan, or one of its shards, for the given scan ID"""
 
-    logger.info(f"Starting scan with ID: {scan_id}")
+    logger.info(f"Starting scan with ID: {scan_id} - Shard: {shard}")
 
     try:
-        scan = models.Scan.objects.get(id=scan_id)
+        scan = models.Scan.objects.select_related("provider").get(id=scan_id)
 
     except models.Scan.DoesNotExist:
         logger.info(f"Scan with ID {scan_id} does not exist.")
         return
 
-    logger.info(f"({scan_id}) Provider: {scan.provider.name} - Name: {scan.name}")
+    logger.info(f"({scan_id}) Provider: {scan.provider.name} - Name: {scan.name} - Shards: {scan.shards_total}")
 
-    # Now can start the scan, so let's update its `status` and the `started_at` timestamp
-    scan.status = models.Scan.Status.IN_PROGRESS
-    scan.started_at = timezone.now()
-    scan.save()
+    # A retried job of an already completed scan, nothing left to do
+    if scan.status == models.Scan.Status.COMPLETED:
+        logger.info(f"({scan_id}) Shard {shard} skipped, the scan has already completed")
+        return
 
-    scan_status = models.Scan.Status.COMPLETED
-    failed_reason = None
+    # Another shard has already failed the scan, so there is no need to run these checks
+    if scan.status == models.Scan.Status.FAILED:
+        logger.info(f"({scan_id}) Shard {shard} skipped, the scan has already failed")
+        finish_shard(scan_id)
+        return
 
-    # Gett all the checks for this provider
-    checks = models.Check.objects.filter(provider=scan.provider)
-    if not checks.exists():
-        scan_status = models.Scan.Status.FAILED
+    # Gett all the checks for this provider, every shard takes its part of them, see `get_shard_checks`
+    checks = models.Check.objects.filter(provider_id=scan.provider_id).order_by("id")
+
+    # Scheduled scans only run the checks of their schedule, if it has any
+    if scan.schedule_id is not None and checks.filter(schedules=scan.schedule_id).exists():
+        checks = checks.filter(schedules=scan.schedule_id)
+
+    checks = list(checks)
+
+    # Now can start the scan, so let's update its `status`, `started_at` timestamp and `checks_total`, only the first
+    # shard does it
+    started = models.Scan.objects.filter(id=scan_id, status=models.Scan.Status.PENDING).update(
+        status=models.Scan.Status.IN_PROGRESS,
+        started_at=timezone.now(),
+        checks_total=len(checks),
+        updated_at=timezone.now(),
+    )
+    if started:
+        events.notify_scan_status(scan_id, models.Scan.Status.IN_PROGRESS)
+
+    failed_reason = None
+    if not checks:
         failed_reason = "no checks found for provider"
 
-    # For each check, simulate a delay, a possible exception (it will fail the scan) and a success/failure condition
-    for check in checks:
-        time.sleep(settings.CHECK_SLEEP_TIME)
+    checks = get_shard_checks(checks, shard, scan.shards_total)
+
+    # When resuming a scan (e.g. its worker died), the checks with findings were already executed and counted, as
+    # findings and counters are saved in the same transaction, so only the remaining ones are run
+    executed_check_ids = set(models.Finding.objects.filter(scan_id=scan_id).values_list("check_parent_id", flat=True))
+    if executed_check_ids:
+        checks = [check for check in checks if check.id not in executed_check_ids]
+        logger.info(f"({scan_id}) Resuming shard {shard}, {len(checks)} checks remaining")
+
+    # Incremental scans copy forward the results of the baseline scan that are still valid, only running the rest
+    if scan.baseline_id is not None:
+        checks_carried = len(checks)
+        checks = carry_forward_findings(scan, checks)
+        logger.info(f"({scan_id}) Copied {checks_carried - len(checks)} findings from baseline {scan.baseline_id}")
+
+    # Checks run concurrently (see `settings.CHECK_CONCURRENCY`), the first one raising an exception fails the scan
+    # Findings are inserted in batches, and the buffer is always flushed before saving the scan final `status`
+    try:
+        with FindingBuffer(scan) as findings:
+            for check, success in execute_checks(checks):
+                findings.add(check, success)
+                logger.info(f"({scan_id}) Check: {check.name} - Success: {success}")
+
+    except CheckExecutionError as error:
+        failed_reason = "Some checks could not be completed"
+        logger.info(f"({scan_id}) Check: {error.check.name} - An unexpected error occurred")
+
+    # Saving scan final `status`` and `finished_at` timestamp when all the shards have finished or this one failed
+    scan = finish_shard(scan_id, failed_reason)
+
+    logger.info(f"({scan_id}) Shard {shard} finished - Status: {scan.status}")
+    logger.info(f"Finished scan with ID: {scan_id} - Shard: {shard}")
+
+
+@app.periodic(cron="* * * * *")
+@app.task(queueing_lock="reap_stalled_scans")
+async def reap_stalled_scans(timestamp):
+    """
+    Re-queue the scan jobs whose worker has died, detected by its missing heartbeats, so their scans don't stay
+    `in_progress` forever.
+
+    Note:
+    The retried jobs resume their scans, running only the checks without findings.
+    """
+
+    stalled_jobs = await app.job_manager.get_stalled_jobs(
+        task_name=start_scan.name, seconds_since_heartbeat=settings.SCAN_STALLED_SECONDS
+    )
+    for job in stalled_jobs:
+        logger.info(f"Re-queueing stalled job {job.id} of task {job.task_name}")
+
+        # A coalescing scan waiting to start holds the queueing lock of the job, it's retried once that scan starts
+        try:
+            await app.job_manager.retry_job(job)
+
+        except AlreadyEnqueued:
+            logger.warning(f"Stalled job {job.id} not re-queued yet, its queueing lock is taken")
+
+
+@app.task
+def defer_scheduled_scan(scan_id):
+    """
+    Defer the jobs of a scan created by a schedule, once its random delay is over.
+
+    Note:
+    The delay is waited by this job, without lock, not by the scan jobs: `procrastinate` doesn't fetch any job behind a
+    `todo` job with the same lock, even if scheduled later, so delayed scan jobs holding a provider lock would block the
+    on-demand scans of their provider until they start.
+    """
+
+    scan = models.Scan.objects.filter(id=scan_id, status=models.Scan.Status.PENDING).first()
+    if scan is None:
+        logger.info(f"Scheduled scan with ID {scan_id} does not exist or has already started.")
+        return
+
+    defer_scan(scan)
+
+
+@app.periodic(cron="* * * * *")
+@app.task(queueing_lock="run_scan_schedules")
+def run_scan_schedules(timestamp):
+    """
+    Create the scans of the due schedules at once, deferring their jobs with a random delay of up to
+    `SCAN_SCHEDULE_JITTER` seconds (see `defer_scheduled_scan`), so the schedules firing at the same minute don't start
+    all together.
+
+    Note:
+    The due schedules are locked while their scans are created, skipping the ones being run by another worker. Missed
+    runs (e.g. with no worker) are not caught up, the schedule only runs once and waits for its next run.
+    """
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        schedules = list(
+            models.ScanSchedule.objects.select_for_update(skip_locked=True).filter(enabled=True, next_run_at__lte=now)
+        )
+        if not schedules:
+            return
+
+        # Scans of schedules without checks run all the checks of their provider
+        checks_by_schedule = dict(
+            models.ScanSchedule.checks.through.objects.filter(scanschedule__in=schedules)
+            .values("scanschedule_id")
+            .annotate(total=Count("id"))
+            .values_list("scanschedule_id", "total")
+        )
+        checks_by_provider = dict(
+            models.Check.objects.filter(provider_id__in={schedule.provider_id for schedule in schedules})
+            .values("provider_id")
+            .annotate(total=Count("id"))
+            .values_list("provider_id", "total")
+        )
+
+        scans = []
+        for schedule in schedules:
+            checks_total = checks_by_schedule.get(schedule.id) or checks_by_provider.get(schedule.provider_id, 0)
+            scans.append(
+                models.Scan(
+                    provider_id=schedule.provider_id,
+                    schedule=schedule,
+                    name=f"{schedule.name[:100]} - {schedule.next_run_at:%Y-%m-%d %H:%M}",
+                    priority=schedule.priority,
+                    checks_total=checks_total,
+                    shards_total=max(1, min(settings.SCAN_SHARDS, checks_total)),
+                )
+            )
 
-        if random.random() < settings.CHECK_EXCEPTION_RATE:
-            scan_status = models.Scan.Status.FAILED
-            failed_reason = "Some checks could not be completed"
-            logger.info(f"({scan_id}) Check: {check.name} - An unexpected error occurred")
-            break
+            schedule.last_run_at = schedule.next_run_at
+            schedule.next_run_at = schedule.get_next_run_at(now)
+            schedule.updated_at = now
 
-        success = random.random() < settings.CHECK_SUCCESS_RATE
-        models.Finding.objects.create(scan=scan, check_parent=check, success=success)
-        logger.info(f"({scan_id}) Check: {check.name} - Success: {success}")
+        models.Scan.objects.bulk_create(scans)
+        models.ScanSchedule.objects.bulk_update(schedules, ["last_run_at", "next_run_at", "updated_at"])
 
-    # Saving scan final `status`` and `finished_at` timestamp
-    scan.status = scan_status
-    scan.failed_reason = failed_reason
-    scan.finished_at = timezone.now()
-    scan.save()
+        for scan in scans:
+            queue, priority = SCAN_QUEUES[scan.priority]
+            schedule_in = {"seconds": random.uniform(0, settings.SCAN_SCHEDULE_JITTER)}
+            job = defer_scheduled_scan.configure(queue=queue, priority=priority, schedule_in=schedule_in)
+            job.defer(scan_id=str(scan.id))
 
-    logger.info(f"({scan_id}) Final status: {scan.status}")
-    logger.info(f"Finished scan with ID: {scan_id}")
+    logger.info(f"Created {len(scans)} scheduled scans")
@@ -1,12 +1,61 @@
+import contextlib
+import csv
+import io
+import json
+import threading
+import time
+
+from datetime import UTC, datetime, timedelta
+
 import pytest
 
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
-
-from api.models import Check, Finding, Provider, Scan
+from rest_framework.test import APIRequestFactory
+
+from api import admin, events, profiling, seeding
+from api.models import Check, Finding, Provider, Scan, ScanSchedule
+from api.ocsf import OCSFImportError, import_ocsf, iter_json_array
+from api.scanner import CheckExecutionError, FindingBuffer, execute_checks
+from api.tasks import (
+    defer_scan,
+    defer_scheduled_scan,
+    get_shard_checks,
+    reap_stalled_scans,
+    run_scan_schedules,
+    start_scan,
+)
+from api.views import FindingViewSet, ScanViewSet
 from conftest import CHECKS, FINDINGS, PROVIDERS, SCANS, TASK_NAME
 
 
+@contextlib.contextmanager
+def notify_status(scan, status):
+    """Notify the scan status until the block ends, as it could be notified before the request subscribes"""
+
+    received = threading.Event()
+    payload = json.dumps({"id": str(scan.id), "status": status})
+
+    def notify():
+        while not received.wait(0.05):
+            events.listener.dispatch(payload)
+
+    notifier = threading.Thread(target=notify)
+    notifier.start()
+    try:
+        yield
+
+    finally:
+        received.set()
+        notifier.join()
+
+
 class TestHealthAPI:
     """Test health check endpoint"""
 
@@ -88,6 +137,80 @@ class TestProviderAPI:
         assert response.status_code == status.HTTP_404_NOT_FOUND  # Check using API
         assert not Provider.objects.filter(id=self.provider.id).exists()  # Check using Django ORM
 
+    def test_provider_catalog_cached(self, api_client, django_assert_num_queries):
+        """Test that providers are read from the cache until a provider or check changes"""
+
+        url_list = reverse("providers-list")
+        url_detail = reverse("providers-detail", kwargs={"pk": self.provider.id})
+        api_client.get(url_list)
+        api_client.get(url_detail)
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url_list)
+            assert response.data["results"][0]["checks_total"] == 0
+            assert api_client.get(url_detail).data["name"] == PROVIDERS["azure"]
+
+        Check.objects.create(provider=self.provider, name=CHECKS["aws_s3"])
+        assert api_client.get(url_list).data["results"][0]["checks_total"] == 1
+        assert api_client.get(url_detail).data["name"] == PROVIDERS["azure"]
+
+        Provider.objects.filter(id=self.provider.id).update(name=PROVIDERS["gcp"])  # `update` sends no signals
+        assert api_client.get(url_detail).data["name"] == PROVIDERS["azure"]
+
+        api_client.put(url_detail, {"name": PROVIDERS["aws"]}, format="json")
+        assert api_client.get(url_detail).data["name"] == PROVIDERS["aws"]
+        assert api_client.get(url_list).data["results"][0]["name"] == PROVIDERS["aws"]
+
+    def test_provider_conditional_get(self, api_client, django_assert_num_queries):
+        """Test that a provider the client already has is answered with `304` from the cache, until a check changes"""
+
+        url = reverse("providers-detail", kwargs={"pk": self.provider.id})
+        response = api_client.get(url)
+        etag = response["ETag"]
+        assert etag.startswith('W/"')
+        assert "Last-Modified" not in response  # Adding a check doesn't change the provider `updated_at`
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+        Check.objects.create(provider=self.provider, name=CHECKS["aws_s3"])
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_lists_without_last_modified(self, api_client):
+        """Test that lists only have an `ETag`, as a deleted row doesn't change their max `updated_at`"""
+
+        check = Check.objects.create(provider=self.provider, name=CHECKS["aws_s3"])
+        Check.objects.create(provider=self.provider, name=CHECKS["aws_ec2"])
+        for url in [
+            reverse("providers-list"),
+            reverse("provider-checks-list", kwargs={"provider_pk": self.provider.id}),
+        ]:
+            response = api_client.get(url)
+            assert "ETag" in response
+            assert "Last-Modified" not in response
+
+        check.delete()  # Not the last updated one
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 1
+
+    def test_provider_sparse_fields(self, api_client, django_assert_num_queries):
+        """Test that the checks of the providers are only counted if `checks_total` is requested"""
+
+        url = reverse("providers-list")
+        with django_assert_num_queries(2) as context:
+            response = api_client.get(url, {"fields": "id,name"})
+
+        assert response.data["results"] == [{"id": str(self.provider.id), "name": PROVIDERS["azure"]}]
+        assert not any("COUNT(DISTINCT" in query["sql"] for query in context.captured_queries)
+
+        response = api_client.get(url, {"omit": "created_at,updated_at,name"})
+        assert set(response.data["results"][0]) == {"id", "checks_total"}
+
     def test_provider_name_unique_constraint(self, api_client):
         """Test that provider names must be unique"""
 
@@ -144,6 +267,61 @@ class TestCheckAPI:
 
         assert len(response.data["results"]) == 2  # Checks on the _original_ provider remain unaffected
 
+    def test_bulk_sync_checks(self, api_client, django_assert_max_num_queries):
+        """Test syncing the checks of a provider in a request, creating the missing ones and pruning the others"""
+
+        finding_scan = Scan.objects.create(provider=self.provider, name=SCANS["staging"])
+        Finding.objects.create(scan=finding_scan, check_parent=self.check, success=True)
+        url = reverse("provider-checks-bulk", kwargs={"provider_pk": self.provider.id})
+        url_list = reverse("provider-checks-list", kwargs={"provider_pk": self.provider.id})
+        assert api_client.get(url_list).data["count"] == 1
+
+        names = [CHECKS["aws_ec2"], *(f"check_{index}" for index in range(50)), "check_0"]
+        with django_assert_max_num_queries(6):
+            response = api_client.post(url, {"names": names}, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"created": 50, "unchanged": 1, "removed": 0, "conflicts": []}
+        assert api_client.get(url_list).data["count"] == 51  # The cached list is invalidated
+        assert Check.objects.filter(provider=self.provider_alternative).count() == 0
+
+        response = api_client.post(url, {"names": ["check_0", CHECKS["aws_s3"]], "prune": True}, format="json")
+        assert response.data == {"created": 1, "unchanged": 1, "removed": 49, "conflicts": [self.check.name]}
+        assert set(Check.objects.filter(provider=self.provider).values_list("name", flat=True)) == {
+            "check_0",
+            CHECKS["aws_s3"],
+            self.check.name,
+        }
+        assert Finding.objects.filter(scan=finding_scan).count() == 1  # The checks of past scans are not pruned
+
+        assert api_client.post(url, {"names": []}, format="json").status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.post(url, {"names": ["x" * 129]}, format="json").status_code == status.HTTP_400_BAD_REQUEST
+
+        url = reverse("provider-checks-bulk", kwargs={"provider_pk": self.check.id})
+        assert api_client.post(url, {"names": names}, format="json").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_provider_checks_cached(self, api_client, django_assert_num_queries):
+        """Test that the checks of a provider are read from the cache until one of them changes"""
+
+        url = reverse("provider-checks-list", kwargs={"provider_pk": self.provider.id})
+        url_alternative = reverse("provider-checks-list", kwargs={"provider_pk": self.provider_alternative.id})
+        api_client.get(url)
+        api_client.get(url_alternative)
+
+        with django_assert_num_queries(0):
+            assert len(api_client.get(url).data["results"]) == 1
+
+        # Only the checks of the changed provider are invalidated
+        self.check.name = CHECKS["aws_iam"]
+        self.check.save()
+        with django_assert_num_queries(0):
+            api_client.get(url_alternative)
+
+        assert api_client.get(url).data["results"][0]["name"] == CHECKS["aws_iam"]
+
+        self.check.delete()
+        assert api_client.get(url).data["results"] == []
+
     def test_retrieve_check(self, api_client):
         """Test retrieving a specific check"""
 
@@ -222,6 +400,73 @@ class TestScanAPI:
         assert len(jobs) == 1
         assert jobs[1]["task_name"] == TASK_NAME
 
+    def test_create_scan_priority(self, api_client, procrastinate_app):
+        """Test that the scan priority sets the queue and priority of its job, and can't be updated"""
+
+        url = reverse("scans-list")
+        response = api_client.post(url, {**self.scan_data, "priority": Scan.Priority.HIGH}, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["priority"] == Scan.Priority.HIGH
+
+        job = procrastinate_app.connector.jobs[1]
+        assert job["queue_name"] == "scans_high"
+        assert job["priority"] == 10
+        assert job["lock"] is None  # No concurrency limit by default
+
+        url_detail = reverse("scans-detail", kwargs={"pk": response.data["id"]})
+        response = api_client.patch(url_detail, {"priority": Scan.Priority.LOW}, format="json")
+        assert response.data["priority"] == Scan.Priority.HIGH
+
+        response = api_client.post(url, {**self.scan_data, "name": "Other", "priority": "urgent"}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_provider_concurrency(self, api_client, procrastinate_app, settings):
+        """Test that the scan jobs of a provider share as many locks as its concurrency limit"""
+
+        settings.SCAN_PROVIDER_CONCURRENCY = 2
+        url = reverse("scans-list")
+
+        for index in range(3):
+            response = api_client.post(url, {**self.scan_data, "name": f"Scan {index}"}, format="json")
+            assert response.status_code == status.HTTP_201_CREATED
+
+        locks = [job["lock"] for job in procrastinate_app.connector.jobs.values()]
+        assert locks == [
+            f"provider-{self.provider.id}-0",
+            f"provider-{self.provider.id}-1",
+            f"provider-{self.provider.id}-0",
+        ]
+        assert {job["queue_name"] for job in procrastinate_app.connector.jobs.values()} == {"scans"}
+
+    def test_create_scan_coalesced(self, api_client, procrastinate_app, worker, settings):
+        """Test that new scans join the pending scan of the provider and priority, until it starts"""
+
+        settings.SCAN_COALESCE = True
+        settings.CHECK_SLEEP_TIME = 0
+        settings.CHECK_EXCEPTION_RATE = 0
+        url = reverse("scans-list")
+
+        response = api_client.post(url, self.scan_data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        pending_id = response.data["id"]
+
+        response = api_client.post(url, {**self.scan_data, "name": "Burst"}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["id"] == pending_id
+        assert not Scan.objects.filter(name="Burst").exists()
+        assert len(procrastinate_app.connector.jobs) == 1
+
+        # Other priorities are not coalesced
+        response = api_client.post(url, {**self.scan_data, "name": "Urgent", "priority": "high"}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # Once the pending scan starts, a new scan is created
+        worker()
+        response = api_client.post(url, {**self.scan_data, "name": "Burst"}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["id"] != pending_id
+
     def test_create_scan(self, api_client, worker):
         """Test creating a scan and running the worker"""
 
@@ -245,6 +490,58 @@ class TestScanAPI:
         response = api_client.get(url_get)
 
         assert response.data["status"] == Scan.Status.COMPLETED
+        assert response.data["checks_total"] == 2
+        assert response.data["checks_executed"] == 2
+        assert response.data["checks_pending"] == 0
+        assert response.data["checks_success"] == 2
+        assert response.data["checks_failed"] == 0
+        assert response.data["success"] is True
+
+    def test_create_sharded_scan(self, api_client, procrastinate_app, worker, settings):
+        """Test that a scan is split into several jobs and completed when all of them finish"""
+
+        settings.SCAN_SHARDS = 3  # Capped by the number of checks of the provider
+
+        url = reverse("scans-list")
+        response = api_client.post(url, self.scan_data, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["shards_total"] == 2
+
+        jobs = procrastinate_app.connector.jobs
+        assert len(jobs) == 2
+        assert {job["args"]["shard"] for job in jobs.values()} == {0, 1}
+
+        worker()
+
+        scan = Scan.objects.get(id=response.data["id"])
+        assert scan.status == Scan.Status.COMPLETED
+        assert scan.shards_finished == 2
+        assert scan.findings.count() == 2
+
+    def test_retried_shard_of_failed_scan(self):
+        """Test that retrying a shard of a failed scan doesn't count it again past `shards_total`"""
+
+        scan = Scan.objects.create(
+            provider=self.provider, name=SCANS["production"], status=Scan.Status.FAILED, shards_total=2
+        )
+        for _ in range(3):  # Both shards, then a retry of one of them
+            start_scan(scan_id=str(scan.id), shard=1)
+
+        scan.refresh_from_db()
+        assert scan.status == Scan.Status.FAILED
+        assert scan.shards_finished == 2
+
+    def test_shard_checks_stable(self):
+        """Test that the checks of each shard don't move to another shard when checks are added or removed"""
+
+        checks = [Check.objects.create(provider=self.provider, name=f"check_{index}") for index in range(20)]
+        shards = [get_shard_checks(checks, shard, 3) for shard in range(3)]
+        assert sorted(check.id for shard in shards for check in shard) == sorted(check.id for check in checks)
+
+        checks = checks[5:] + [Check.objects.create(provider=self.provider, name="check_new")]
+        for shard, shard_checks in enumerate(shards):
+            assert {check for check in shard_checks if check in checks} <= set(get_shard_checks(checks, shard, 3))
 
     def test_list_scans(self, api_client):
         """Test listing all scans"""
@@ -320,6 +617,380 @@ class TestScanAPI:
         assert response.status_code == status.HTTP_200_OK
         assert response.data["status"] == Scan.Status.PENDING
 
+    def test_scan_status_long_poll(self, api_client, settings):
+        """Test that `?wait=` answers as soon as the status changes, or with the current one after waiting"""
+
+        scan = Scan.objects.create(provider=self.provider, name=SCANS["production"])
+        url = reverse("scans-status", kwargs={"pk": scan.id})
+
+        # Sync workers don't wait, a waiting client would stall the API
+        start = time.monotonic()
+        response = api_client.get(url, {"wait": 10})
+        assert response.data["status"] == Scan.Status.PENDING
+        assert time.monotonic() - start < 1
+        assert api_client.get(url, {"wait": "soon"}).status_code == status.HTTP_400_BAD_REQUEST
+
+        settings.API_ASYNC = True
+        factory = APIRequestFactory()
+        view = async_to_sync(ScanViewSet.as_view({"get": "status"}))
+
+        start = time.monotonic()
+        with notify_status(scan, Scan.Status.IN_PROGRESS):
+            response = view(factory.get(url, {"wait": 10}), pk=str(scan.id))
+
+        assert response.data["status"] == Scan.Status.IN_PROGRESS
+        assert time.monotonic() - start < 10
+
+        # No change during the wait
+        start = time.monotonic()
+        response = view(factory.get(url, {"wait": 0.1}), pk=str(scan.id))
+        assert response.data["status"] == Scan.Status.PENDING
+        assert time.monotonic() - start >= 0.1
+
+        # Already changed or finished scans are answered at once
+        response = view(factory.get(url, {"wait": 10, "status": Scan.Status.IN_PROGRESS}), pk=str(scan.id))
+        assert response.data["status"] == Scan.Status.PENDING
+
+        response = view(factory.get(url, {"wait": 10}), pk=str(self.scan.id))
+        assert response.data["status"] == Scan.Status.COMPLETED
+
+        response = view(factory.get(url, {"wait": "soon"}), pk=str(scan.id))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_status_listener_ready(self, monkeypatch):
+        """Test that waiting clients wait until the listener is `LISTEN`ing, so no notification is missed"""
+
+        monkeypatch.setattr(events, "connection", type("Connection", (), {"vendor": "postgresql"}))
+        listener = events.ScanStatusListener()
+        listener.ready_timeout = 0.1
+        assert not listener.wait_ready()
+
+        threading.Timer(0.05, listener.ready.set).start()
+        listener.ready_timeout = 5
+        start = time.monotonic()
+        assert async_to_sync(listener.async_wait_ready)()
+        assert time.monotonic() - start < 5
+
+    def test_scan_status_listener_not_ready(self, settings, monkeypatch, caplog):
+        """Test that a long-poll is answered at once, telling it, if the listener is not `LISTEN`ing"""
+
+        async def async_wait_ready():
+            return False
+
+        monkeypatch.setattr(events.listener, "async_wait_ready", async_wait_ready)
+        settings.API_ASYNC = True
+        view = async_to_sync(ScanViewSet.as_view({"get": "status"}))
+        url = reverse("scans-status", kwargs={"pk": self.scan.id})
+
+        start = time.monotonic()
+        response = view(
+            APIRequestFactory().get(url, {"wait": 10, "status": Scan.Status.COMPLETED}), pk=str(self.scan.id)
+        )
+        assert time.monotonic() - start < 1
+        assert response.data["status"] == Scan.Status.COMPLETED
+        assert response["X-Long-Poll"] == "unavailable"
+        assert "listener not ready" in caplog.text
+
+    def test_resume_stalled_scan(self, procrastinate_app):
+        """Test that the job of a dead worker is re-queued and its scan resumes, only running the remaining checks"""
+
+        scan = Scan.objects.create(provider=self.provider, name=SCANS["production"])
+        defer_scan(scan)
+
+        # The worker died after saving the first finding
+        Finding.objects.create(scan=scan, check_parent=self.check_0, success=True)
+        Scan.objects.filter(id=scan.id).update(
+            status=Scan.Status.IN_PROGRESS, checks_total=2, checks_executed=1, checks_success=1
+        )
+        job = procrastinate_app.connector.jobs[1]
+        job.update(status="doing", worker_id=1)
+        procrastinate_app.connector.workers[1] = datetime.now(UTC) - timedelta(hours=1)
+
+        async_to_sync(reap_stalled_scans.func)(timestamp=0)
+        assert job["status"] == "todo"
+
+        start_scan(**job["args"])
+
+        scan.refresh_from_db()
+        assert scan.status == Scan.Status.COMPLETED
+        assert scan.checks_executed == 2
+        assert scan.checks_success == 2
+        assert scan.findings.count() == 2
+
+    def test_incremental_scan(self, api_client, procrastinate_app, settings):
+        """Test that an incremental scan only runs the failed, new, changed or expired checks of its baseline"""
+
+        settings.CHECK_SLEEP_TIME = 0
+        settings.CHECK_EXCEPTION_RATE = 0
+
+        Finding.objects.create(scan=self.scan, check_parent=self.check_0, success=True)
+        Finding.objects.create(scan=self.scan, check_parent=self.check_1, success=False)
+        check_expired = Check.objects.create(provider=self.provider, name=CHECKS["aws_iam"])
+        Finding.objects.create(
+            scan=self.scan, check_parent=check_expired, success=True, executed_at=timezone.now() - timedelta(days=2)
+        )
+        check_changed = Check.objects.create(provider=self.provider, name="Changed check")
+        Finding.objects.create(scan=self.scan, check_parent=check_changed, success=True)
+        check_changed.save()
+        Check.objects.create(provider=self.provider, name="New check")
+
+        url = reverse("scans-list")
+        response = api_client.post(url, {**self.scan_data, "baseline_id": self.scan.id}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert str(response.data["baseline_id"]) == str(self.scan.id)
+
+        start_scan(scan_id=response.data["id"])
+
+        scan = Scan.objects.get(id=response.data["id"])
+        assert scan.status == Scan.Status.COMPLETED
+        assert (scan.checks_executed, scan.checks_carried) == (5, 1)
+        carried = scan.findings.filter(executed_at__isnull=False)
+        assert [finding.check_parent_id for finding in carried] == [self.check_0.id]
+        assert carried[0].executed_at == self.scan.findings.get(check_parent=self.check_0).created_at
+
+        # Only completed scans of the same provider can be a baseline
+        response = api_client.post(url, {**self.scan_data, "name": "Other", "baseline_id": scan.id}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+
+        other_scan = Scan.objects.create(provider=Provider.objects.create(name=PROVIDERS["gcp"]), name=SCANS["staging"])
+        Scan.objects.filter(id=other_scan.id).update(status=Scan.Status.COMPLETED)
+        for baseline_id in [response.data["id"], other_scan.id]:
+            response = api_client.post(
+                url, {**self.scan_data, "name": "Bad", "baseline_id": baseline_id}, format="json"
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_scan_status_notified(self, django_capture_on_commit_callbacks):
+        """Test that the scan task notifies its status changes"""
+
+        scan = Scan.objects.create(provider=self.provider, name=SCANS["production"])
+        subscription = events.listener.subscribe(scan.id)
+        statuses = []
+        subscription.set = statuses.append
+
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                start_scan(scan_id=str(scan.id))
+
+        finally:
+            events.listener.unsubscribe(subscription)
+
+        assert statuses == [Scan.Status.IN_PROGRESS, Scan.Status.COMPLETED]
+
+    def test_reconcile_scan_counters(self):
+        """Test that the `reconcile_scans` command backfills the stored counters"""
+
+        Finding.objects.create(scan=self.scan, check_parent=self.check_0, success=True)
+        Finding.objects.create(scan=self.scan, check_parent=self.check_1, success=False)
+
+        call_command("reconcile_scans")
+
+        self.scan.refresh_from_db()
+        assert self.scan.checks_total == 2
+        assert self.scan.checks_executed == 2
+        assert self.scan.checks_success == 1
+        assert self.scan.checks_failed == 1
+        assert self.scan.success is False
+
+    def test_reconcile_scans_queries(self, django_assert_num_queries):
+        """Test that `reconcile_scans` runs the same queries for any number of scans, without deferred field loads"""
+
+        for index in range(50):
+            scan = Scan.objects.create(provider=self.provider, name=f"Reconcile {index}", status=Scan.Status.COMPLETED)
+            Finding.objects.create(scan=scan, check_parent=self.check_0, success=True)
+
+        # Scans, their findings counts, the checks counts of their providers (no `checks_total` yet) and the update
+        with django_assert_num_queries(4):
+            call_command("reconcile_scans", stdout=io.StringIO())
+
+        assert Scan.objects.filter(name__startswith="Reconcile", success=True, checks_executed=1).count() == 50
+
+    def test_reconcile_keeps_checks_total(self):
+        """Test that `reconcile_scans` keeps the stored `checks_total`, only raising it below the executed checks"""
+
+        Check.objects.create(provider=self.provider, name=CHECKS["aws_iam"])  # Added after the scans
+        Finding.objects.create(scan=self.scan, check_parent=self.check_0, success=True)
+        Scan.objects.filter(id=self.scan.id).update(checks_total=1)
+        scan_subset = Scan.objects.create(
+            provider=self.provider, name=SCANS["development"], status=Scan.Status.COMPLETED, checks_total=1
+        )
+        Finding.objects.create(scan=scan_subset, check_parent=self.check_1, success=True)
+        Finding.objects.create(scan=scan_subset, check_parent=self.check_0, success=True)
+
+        call_command("reconcile_scans")
+
+        self.scan.refresh_from_db()
+        assert (self.scan.checks_total, self.scan.success) == (1, True)
+        scan_subset.refresh_from_db()
+        assert (scan_subset.checks_total, scan_subset.checks_executed) == (2, 2)
+
+    def test_reconcile_legacy_checks_total(self):
+        """Test that `reconcile_scans` backfills a missing `checks_total` with the checks of the schedule or provider"""
+
+        scan_failed = Scan.objects.create(provider=self.provider, name=SCANS["development"], status=Scan.Status.FAILED)
+        Finding.objects.create(scan=scan_failed, check_parent=self.check_0, success=True)
+        schedule = ScanSchedule.objects.create(provider=self.provider, name=SCANS["staging"], cron="0 * * * *")
+        schedule.checks.set([self.check_1])
+        scan_scheduled = Scan.objects.create(provider=self.provider, name="Scheduled", schedule=schedule)
+
+        call_command("reconcile_scans")
+
+        scan_failed.refresh_from_db()
+        assert (scan_failed.checks_total, scan_failed.checks_executed, scan_failed.checks_pending) == (2, 1, 1)
+        scan_scheduled.refresh_from_db()
+        assert scan_scheduled.checks_total == 1
+
+    def test_scan_success_follows_findings(self):
+        """Test that the stored `success` is recalculated when a finding `success` changes"""
+
+        finding = Finding.objects.create(scan=self.scan, check_parent=self.check_0, success=False)
+        call_command("reconcile_scans")
+
+        finding.success = True
+        finding.save()
+        finding.update_scan_counters(previous_success=False)
+
+        self.scan.refresh_from_db()
+        assert self.scan.checks_success == 1
+        assert self.scan.checks_failed == 0
+        assert self.scan.success is True
+
+    def test_explain_queries_use_indexes(self):
+        """Test that the listing and filtering queries use indexes on a seeded dataset"""
+
+        output = io.StringIO()
+        call_command("explain_queries", "--seed-scans", "5", "--seed-checks", "20", stdout=output)
+
+        for query in ["scans_list", "scans_active", "findings_list", "findings_failed", "findings_export"]:
+            assert f"{query}: index" in output.getvalue()
+
+        assert not Scan.objects.filter(name__startswith="Explain").exists()  # Seeded data is rolled back
+
+    def test_async_views(self, api_client, procrastinate_app, settings):
+        """Test that the async views return the same as the sync ones, also serving the sync actions of their routes"""
+
+        settings.API_ASYNC = True
+        factory = APIRequestFactory()
+        list_view = ScanViewSet.as_view({"get": "list", "post": "create"})
+        detail_view = ScanViewSet.as_view({"get": "retrieve", "patch": "partial_update"})
+        status_view = ScanViewSet.as_view({"get": "status"})
+        assert all(iscoroutinefunction(view) for view in [list_view, detail_view, status_view])
+
+        url = reverse("scans-list")
+        response = async_to_sync(list_view)(factory.get(url))
+        assert response.data == api_client.get(url).data
+
+        url = reverse("scans-detail", kwargs={"pk": self.scan.id})
+        response = async_to_sync(detail_view)(factory.get(url), pk=str(self.scan.id))
+        assert response.data == api_client.get(url).data
+
+        response = async_to_sync(status_view)(factory.get(url), pk=str(self.scan.id))
+        assert response.data == {"status": Scan.Status.COMPLETED}
+
+        response = async_to_sync(status_view)(factory.get(url), pk=str(self.check_0.id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        scan = Scan.objects.create(provider=self.provider, name=SCANS["development"])
+        with notify_status(scan, Scan.Status.IN_PROGRESS):
+            response = async_to_sync(status_view)(factory.get(url, {"wait": 10}), pk=str(scan.id))
+        assert response.data == {"status": Scan.Status.IN_PROGRESS}
+
+        response = async_to_sync(status_view)(factory.get(url, {"wait": 0.1}), pk=str(scan.id))
+        assert response.data == {"status": Scan.Status.PENDING}
+
+        # Sync actions sharing a route with an async one
+        response = async_to_sync(list_view)(factory.post(url, self.scan_data, format="json"))
+        assert response.status_code == status.HTTP_201_CREATED
+
+        request = factory.patch(url, {"comment": SCANS["comment_daily"]}, format="json")
+        response = async_to_sync(detail_view)(request, pk=str(self.scan.id))
+        assert response.data["comment"] == SCANS["comment_daily"]
+
+        settings.API_ASYNC = False
+        assert not iscoroutinefunction(ScanViewSet.as_view({"get": "list"}))
+
+    def test_scan_conditional_get(self, api_client, settings, django_assert_num_queries):
+        """Test that scans the client already has are answered with `304` after a single query, also when async"""
+
+        url_list = reverse("scans-list")
+        url_detail = reverse("scans-detail", kwargs={"pk": self.scan.id})
+        response = api_client.get(url_detail)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        assert api_client.get(url_list)["ETag"] != etag
+
+        with django_assert_num_queries(1):
+            response = api_client.get(url_detail, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not response.content
+
+        response = api_client.get(url_detail, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        settings.API_ASYNC = True
+        request = APIRequestFactory().get(url_detail, HTTP_IF_NONE_MATCH=etag)
+        response = async_to_sync(ScanViewSet.as_view({"get": "retrieve"}))(request, pk=str(self.scan.id))
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        settings.API_ASYNC = False
+
+        api_client.patch(url_detail, {"comment": SCANS["comment_daily"]}, format="json")
+        response = api_client.get(url_detail, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["comment"] == SCANS["comment_daily"]
+
+        url_missing = reverse("scans-detail", kwargs={"pk": self.check_0.id})
+        assert api_client.get(url_missing, HTTP_IF_NONE_MATCH="*").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_scan_sparse_fields(self, api_client):
+        """Test that scans only have the fields requested with `?fields=` or not omitted with `?omit=`"""
+
+        url_list = reverse("scans-list")
+        url_detail = reverse("scans-detail", kwargs={"pk": self.scan.id})
+
+        response = api_client.get(url_list, {"fields": "id,status,unknown"})
+        assert response.data["results"] == [{"id": str(self.scan.id), "status": Scan.Status.COMPLETED}]
+        assert api_client.get(url_detail, {"fields": "id,status"})["ETag"] != api_client.get(url_detail)["ETag"]
+
+        response = api_client.get(url_detail, {"omit": "progress,comment,provider_id"})
+        assert response.data["name"] == SCANS["staging"]
+        assert not response.data.keys() & {"progress", "comment", "provider_id"}
+
+        # Only reading is sparse
+        url_patch = f"{url_detail}?fields=id"
+        response = api_client.patch(url_patch, {"comment": SCANS["comment_daily"], "priority": "low"}, format="json")
+        assert response.data["comment"] == SCANS["comment_daily"]
+        assert response.data["priority"] == Scan.Priority.NORMAL
+
+    def test_load_data_and_benchmark(self, tmp_path):
+        """Test that the load data is generated and every API route and the scan task are benchmarked"""
+
+        call_command("generate_load_data", "--providers", "2", "--checks", "10", "--scans", "3", stdout=io.StringIO())
+
+        assert Scan.objects.filter(name__startswith="Load", status=Scan.Status.COMPLETED).count() == 6
+        assert Finding.objects.filter(scan__name__startswith="Load").count() == 60
+
+        output = tmp_path / "benchmark.json"
+        call_command("benchmark_api", "--repeat", "1", "--output", str(output), stdout=io.StringIO())
+        results = json.loads(output.read_text())
+
+        for route in ["providers-list", "scans-list", "scans-status", "scan-findings-list", "scan-findings-export"]:
+            assert results["routes"][route]["status"] == status.HTTP_200_OK
+            assert results["routes"][route]["queries"] > 0
+
+        assert results["tasks"]["start_scan"]["checks"] == 10
+        assert not Scan.objects.filter(name__startswith="Benchmark").exists()  # Benchmarked scan is rolled back
+
+        call_command(
+            "benchmark_api",
+            "--repeat",
+            "1",
+            "--compare",
+            str(output),
+            "--threshold",
+            "1000",
+            "--skip-task",
+            stdout=io.StringIO(),
+        )
+
     def test_scan_unique_constraint(self, api_client):
         """Test that scan names must be unique per provider"""
 
@@ -330,6 +1001,116 @@ class TestScanAPI:
         assert response.status_code == status.HTTP_409_CONFLICT
 
 
+class TestScanScheduleAPI:
+    """Test ScanSchedule CRUD operations (nested under providers) and the scans they create"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self):
+        """Setup test data for each test"""
+
+        self.provider = Provider.objects.create(name=PROVIDERS["aws"])
+        self.check_0 = Check.objects.create(provider=self.provider, name=CHECKS["aws_s3"])
+        self.check_1 = Check.objects.create(provider=self.provider, name=CHECKS["aws_ec2"])
+        self.url = reverse("provider-schedules-list", kwargs={"provider_pk": self.provider.id})
+
+    def test_schedule_sparse_fields(self, api_client, django_assert_num_queries):
+        """Test that the checks of the schedules are only fetched if `check_ids` is requested"""
+
+        ScanSchedule.objects.create(provider=self.provider, name=SCANS["comment_daily"], cron="0 3 * * *")
+        api_client.get(self.url)
+
+        with django_assert_num_queries(3):
+            response = api_client.get(self.url, {"omit": "check_ids"})
+
+        assert "check_ids" not in response.data["results"][0]
+
+    def test_create_schedule(self, api_client):
+        """Test creating a schedule for a subset of the provider checks"""
+
+        data = {"name": SCANS["comment_daily"], "cron": "0 3 * * *", "check_ids": [str(self.check_0.id)]}
+        response = api_client.post(self.url, data, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["check_ids"] == [self.check_0.id]
+        next_run_at = ScanSchedule.objects.get(id=response.data["id"]).next_run_at
+        assert next_run_at > timezone.now()
+        assert (next_run_at.hour, next_run_at.minute) == (3, 0)
+
+        response = api_client.post(self.url, {"name": "Invalid", "cron": "every day"}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        other_check = Check.objects.create(provider=Provider.objects.create(name=PROVIDERS["gcp"]), name="Other")
+        response = api_client.post(
+            self.url, {"name": "Other", "cron": "0 3 * * *", "check_ids": [str(other_check.id)]}, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_run_scan_schedules(self, procrastinate_app, settings):
+        """Test that the due schedules create their scans at once, with jittered jobs, and wait for their next run"""
+
+        settings.SCAN_SCHEDULE_JITTER = 60
+        settings.CHECK_SLEEP_TIME = 0
+        settings.CHECK_EXCEPTION_RATE = 0
+
+        subset = ScanSchedule.objects.create(provider=self.provider, name=SCANS["comment_daily"], cron="0 3 * * *")
+        subset.checks.set([self.check_0])
+        ScanSchedule.objects.create(provider=self.provider, name=SCANS["comment_weekly"], cron="0 3 * * 1")
+        ScanSchedule.objects.create(provider=self.provider, name="Disabled", cron="0 3 * * *", enabled=False)
+        ScanSchedule.objects.create(provider=self.provider, name="Not due", cron="0 3 * * *")
+
+        now = timezone.now()
+        ScanSchedule.objects.exclude(name="Not due").update(next_run_at=now - timedelta(minutes=1))
+        run_scan_schedules(timestamp=0)
+
+        scans = {scan.schedule.name: scan for scan in Scan.objects.select_related("schedule")}
+        assert set(scans) == {SCANS["comment_daily"], SCANS["comment_weekly"]}
+        assert scans[SCANS["comment_daily"]].checks_total == 1
+        assert scans[SCANS["comment_weekly"]].checks_total == 2
+
+        jobs = list(procrastinate_app.connector.jobs.values())
+        assert len(jobs) == 2
+        assert all(now <= job["scheduled_at"].replace(tzinfo=None) <= now + timedelta(seconds=61) for job in jobs)
+        assert all(job["task_name"] == "api.tasks.defer_scheduled_scan" for job in jobs)
+
+        subset.refresh_from_db()
+        assert subset.last_run_at == now - timedelta(minutes=1)
+        assert subset.next_run_at > now
+
+        # Scans of schedules with checks only run them
+        start_scan(scan_id=str(scans[SCANS["comment_daily"]].id))
+        findings = scans[SCANS["comment_daily"]].findings.values_list("check_parent_id", flat=True)
+        assert list(findings) == [self.check_0.id]
+
+        # Nothing is due until the next run
+        run_scan_schedules(timestamp=0)
+        assert Scan.objects.count() == 2
+
+    def test_scheduled_scan_doesnt_block_provider(self, api_client, procrastinate_app, settings):
+        """Test that a jittered scheduled scan doesn't hold a provider lock, blocking the on-demand scans, until due"""
+
+        settings.SCAN_PROVIDER_CONCURRENCY = 1
+        ScanSchedule.objects.create(provider=self.provider, name=SCANS["comment_daily"], cron="0 3 * * *")
+        ScanSchedule.objects.update(next_run_at=timezone.now() - timedelta(minutes=1))
+        run_scan_schedules(timestamp=0)
+
+        response = api_client.post(
+            reverse("scans-list"), {"provider_id": str(self.provider.id), "name": SCANS["production"]}, format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        jobs = procrastinate_app.connector.jobs
+        scheduled_job, scan_job = jobs[1], jobs[2]
+        assert scheduled_job["lock"] is None
+        assert scan_job["lock"] == f"provider-{self.provider.id}-0"
+        assert scan_job["scheduled_at"] is None  # Runs now
+
+        # Once due, the scheduled scan gets its locked job
+        defer_scheduled_scan(**scheduled_job["args"])
+        assert jobs[3]["task_name"] == TASK_NAME
+        assert jobs[3]["lock"] == f"provider-{self.provider.id}-0"
+        assert jobs[3]["scheduled_at"] is None
+
+
 class TestFindingAPI:
     """Test Finding operations (nested under scans)"""
 
@@ -375,6 +1156,154 @@ class TestFindingAPI:
 
         assert len(response.data["results"]) == 2
 
+    def test_paginate_scan_findings(self, api_client):
+        """Test that findings are paginated with a cursor, newest first, and the count can be skipped"""
+
+        finding = Finding.objects.create(scan=self.scan, check_parent=self.check_1, success=False)
+
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        response = api_client.get(url, {"limit": 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 2
+        assert [result["id"] for result in response.data["results"]] == [str(finding.id)]
+        assert response.data["previous"] is None
+
+        response = api_client.get(response.data["next"])
+
+        assert [result["id"] for result in response.data["results"]] == [str(self.finding.id)]
+        assert response.data["next"] is None
+
+        response = api_client.get(url, {"limit": 1, "count": "false"})
+
+        assert "count" not in response.data
+        assert len(response.data["results"]) == 1
+
+    def test_paginate_tied_findings(self, api_client, django_assert_num_queries):
+        """Test that findings created at the same time are paged by `(created_at, id)`, without offsets"""
+
+        checks = [Check.objects.create(provider=self.provider, name=f"check_{index}") for index in range(6)]
+        Finding.objects.bulk_create(Finding(scan=self.scan, check_parent=check, success=False) for check in checks)
+        Finding.objects.filter(scan=self.scan).update(created_at=self.finding.created_at)
+        expected = list(Finding.objects.filter(scan=self.scan).order_by("-id").values_list("id", flat=True))
+
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        response = api_client.get(url, {"limit": 2, "count": "false"})
+        pages = [response.data]
+        while response.data["next"]:
+            with django_assert_num_queries(2) as context:  # Scan and page
+                response = api_client.get(response.data["next"])
+            assert "OFFSET" not in context.captured_queries[-1]["sql"]
+            pages.append(response.data)
+
+        assert [result["id"] for page in pages for result in page["results"]] == [str(id) for id in expected]
+
+        response = api_client.get(pages[-1]["previous"])
+        assert response.data["results"] == pages[-2]["results"]
+        assert api_client.get(url, {"cursor": "cD1pbnZhbGlk"}).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_findings_conditional_get(self, api_client, settings, django_assert_num_queries):
+        """Test that findings the client already has are answered with `304` from the scan, until one is commented"""
+
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        response = api_client.get(url, {"count": "false"})
+        etag = response["ETag"]
+
+        with django_assert_num_queries(1) as context:  # Only the scan, the findings are neither counted nor fetched
+            response = api_client.get(url, {"count": "false"}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert "api_finding" not in context.captured_queries[0]["sql"]
+
+        settings.API_ASYNC = True
+        request = APIRequestFactory().get(url, {"count": "false"}, HTTP_IF_NONE_MATCH=etag)
+        response = async_to_sync(FindingViewSet.as_view({"get": "list"}))(request, scan_pk=str(self.scan.id))
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        settings.API_ASYNC = False
+
+        url_detail = reverse("scan-findings-detail", kwargs={"scan_pk": self.scan.id, "pk": self.finding.id})
+        api_client.patch(url_detail, {"comment": FINDINGS["comment_passed"] + "!"}, format="json")
+        response = api_client.get(url, {"count": "false"}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_async_list_scan_findings(self, api_client, settings):
+        """Test that the async findings list returns the same as the sync one"""
+
+        settings.API_ASYNC = True
+        view = FindingViewSet.as_view({"get": "list"})
+
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        response = async_to_sync(view)(APIRequestFactory().get(url), scan_pk=str(self.scan.id))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == api_client.get(url).data
+
+        response = async_to_sync(view)(APIRequestFactory().get(url), scan_pk=str(self.provider.id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        request = APIRequestFactory().get(url, HTTP_IF_NONE_MATCH=api_client.get(url)["ETag"])
+        response = async_to_sync(view)(request, scan_pk=str(self.scan.id))
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_bulk_update_scan_findings(self, api_client, django_assert_num_queries):
+        """Test commenting many findings of a scan with a single `UPDATE`, by ids or filtered"""
+
+        failed = [
+            Finding.objects.create(scan=self.scan, check_parent=self.check_1, success=False),
+            Finding.objects.create(scan=self.scan_alternative, check_parent=self.check_1, success=False),
+        ]
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        updated_at = self.finding.updated_at
+
+        with django_assert_num_queries(3):  # Scan, findings and touching the scan
+            data = {"ids": [str(self.finding.id), str(failed[1].id)], "comment": FINDINGS["comment_passed"] + "!"}
+            response = api_client.patch(url, data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"updated": 1}  # Findings of other scans are not updated
+        self.finding.refresh_from_db()
+        assert self.finding.comment == FINDINGS["comment_passed"] + "!"
+        assert self.finding.updated_at > updated_at
+        self.scan.refresh_from_db()
+        assert self.scan.updated_at > updated_at
+
+        response = api_client.patch(url, {"success": False, "comment": "Accepted risk"}, format="json")
+        assert response.data == {"updated": 1}
+        assert list(Finding.objects.filter(comment="Accepted risk")) == [failed[0]]
+
+        response = api_client.patch(url, {"check_ids": [str(self.check_0.id)], "comment": None}, format="json")
+        assert response.data == {"updated": 1}
+        self.scan.refresh_from_db()
+        assert self.scan.checks_success == 0  # `success` is not updated, neither the counters
+
+        assert api_client.patch(url, {"comment": "All"}, format="json").status_code == status.HTTP_400_BAD_REQUEST
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.provider.id})
+        response = api_client.patch(url, {"success": False, "comment": "All"}, format="json")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_export_scan_findings(self, api_client):
+        """Test streaming all the findings of a scan as NDJSON and CSV"""
+
+        Finding.objects.create(scan=self.scan, check_parent=self.check_1, success=False)
+        url = reverse("scan-findings-export", kwargs={"scan_pk": self.scan.id})
+
+        response = api_client.get(url)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert [json.loads(line)["check_name"] for line in lines] == [CHECKS["aws_s3"], CHECKS["aws_ec2"]]
+
+        response = api_client.get(url, {"type": "csv"})
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+
+        assert response["Content-Type"] == "text/csv"
+        assert rows[0][0] == "id"
+        assert len(rows) == 3
+
+        response = api_client.get(url, {"type": "xml"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_retrieve_finding(self, api_client):
         """Test retrieving a specific finding"""
 
@@ -417,6 +1346,339 @@ class TestFindingAPI:
         assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
 
 
+class TestScanner:
+    """Test the concurrent check executor used by the scan task"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self):
+        """Setup test data for each test"""
+
+        self.provider = Provider.objects.create(name=PROVIDERS["aws"])
+        self.checks = [Check.objects.create(provider=self.provider, name=name) for name in CHECKS.values()]
+
+    def test_checks_run_concurrently(self, settings):
+        """Test that checks of a scan run at the same time up to `CHECK_CONCURRENCY`"""
+
+        settings.CHECK_SLEEP_TIME = 0.2
+        settings.CHECK_CONCURRENCY = len(self.checks)
+
+        start = time.monotonic()
+        results = list(execute_checks(self.checks))
+        elapsed = time.monotonic() - start
+
+        assert {check.id for check, _ in results} == {check.id for check in self.checks}
+        assert elapsed < settings.CHECK_SLEEP_TIME * len(self.checks)
+
+    def test_check_exception_fails_fast(self, settings):
+        """Test that a check exception is propagated and the remaining checks are not yielded"""
+
+        settings.CHECK_EXCEPTION_RATE = 1
+        settings.CHECK_CONCURRENCY = 1
+
+        results = []
+        with pytest.raises(CheckExecutionError):
+            for result in execute_checks(self.checks):
+                results.append(result)
+
+        assert results == []
+
+    def test_finding_buffer_flushes_in_batches(self, settings):
+        """Test that findings are inserted when the batch is full and on exit"""
+
+        settings.FINDINGS_BATCH_SIZE = 2
+        settings.FINDINGS_FLUSH_INTERVAL = 60
+        scan = Scan.objects.create(provider=self.provider, name=SCANS["production"])
+
+        with FindingBuffer(scan) as findings:
+            findings.add(self.checks[0], True)
+            assert Finding.objects.filter(scan=scan).count() == 0
+
+            findings.add(self.checks[1], True)
+            assert Finding.objects.filter(scan=scan).count() == 2
+
+            findings.add(self.checks[2], False)
+            assert Finding.objects.filter(scan=scan).count() == 2
+
+        assert Finding.objects.filter(scan=scan).count() == 3
+
+    def test_scan_progress(self, api_client, settings):
+        """Test that the progress is only written when findings are flushed, and reported while the scan runs"""
+
+        settings.FINDINGS_BATCH_SIZE = 2
+        settings.FINDINGS_FLUSH_INTERVAL = 60
+        started_at = timezone.now() - timedelta(seconds=10)
+        scan = Scan.objects.create(
+            provider=self.provider,
+            name=SCANS["production"],
+            status=Scan.Status.IN_PROGRESS,
+            started_at=started_at,
+            checks_total=4,
+        )
+
+        with FindingBuffer(scan) as findings:
+            findings.add(self.checks[0], True)
+            scan.refresh_from_db()
+            assert scan.current_check is None  # Not a write per check
+
+            findings.add(self.checks[1], True)
+
+        scan.refresh_from_db()
+        assert scan.current_check == self.checks[1].name
+        assert scan.progress["percentage"] == 50.0
+
+        # Two checks took 10 seconds, so the other two will take 10 more
+        Scan.objects.filter(id=scan.id).update(progress_at=started_at + timedelta(seconds=10))
+        scan.refresh_from_db()
+        assert scan.progress["eta"] == started_at + timedelta(seconds=20)
+
+        response = api_client.get(reverse("scans-status", kwargs={"pk": scan.id}))
+        assert response.data["progress"]["checks_executed"] == 2
+        assert response.data["progress"]["current_check"] == self.checks[1].name
+
+        response = api_client.get(reverse("scans-detail", kwargs={"pk": scan.id}))
+        assert response.data["progress"]["checks_total"] == 4
+
+        # Of the two checks, one was copied forward from the baseline, so the one run took the 10 seconds
+        Scan.objects.filter(id=scan.id).update(checks_carried=1)
+        scan.refresh_from_db()
+        assert scan.progress["eta"] == started_at + timedelta(seconds=30)
+
+        Scan.objects.filter(id=scan.id).update(status=Scan.Status.COMPLETED)
+        response = api_client.get(reverse("scans-detail", kwargs={"pk": scan.id}))
+        assert response.data["progress"] is None
+
+    def test_scan_fails_on_check_exception(self, api_client, worker, settings):
+        """Test that the scan is marked as `FAILED` when a check can't be completed"""
+
+        settings.CHECK_EXCEPTION_RATE = 1
+
+        url = reverse("scans-list")
+        response = api_client.post(
+            url, {"provider_id": str(self.provider.id), "name": SCANS["production"]}, format="json"
+        )
+
+        worker()
+
+        scan = Scan.objects.get(id=response.data["id"])
+        assert scan.status == Scan.Status.FAILED
+        assert scan.failed_reason is not None
+        assert not scan.findings.exists()
+
+
+class TestOCSFImport:
+    """Test importing Prowler OCSF JSON output files"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self):
+        """Setup test data for each test"""
+
+        self.provider = Provider.objects.create(name=PROVIDERS["aws"])
+        self.check = Check.objects.create(provider=self.provider, name="s3_bucket_public_access")
+
+        self.ocsf_findings = [
+            {"cloud": {"provider": "aws"}, "metadata": {"event_code": self.check.name}, "status_code": "PASS"},
+            {"cloud": {"provider": "aws"}, "metadata": {"event_code": "iam_root_mfa_enabled"}, "status_code": "PASS"},
+            {"cloud": {"provider": "aws"}, "metadata": {"event_code": "iam_root_mfa_enabled"}, "status_code": "FAIL"},
+        ]
+
+    def test_iter_json_array_by_chunks(self):
+        """Test that the incremental parser yields the array objects whatever the chunk size is"""
+
+        content = json.dumps(self.ocsf_findings, indent=4)
+
+        assert list(iter_json_array(io.StringIO(content), chunk_size=7)) == self.ocsf_findings
+
+    def test_import_ocsf_upload(self, api_client):
+        """Test uploading an OCSF file creates a completed scan, reusing and creating checks"""
+
+        upload = SimpleUploadedFile("output.json", json.dumps(self.ocsf_findings).encode())
+        url = reverse("scans-import-ocsf")
+        response = api_client.post(url, {"file": upload, "name": SCANS["production"]}, format="multipart")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data) == 1
+        assert response.data[0]["status"] == Scan.Status.COMPLETED
+        assert response.data[0]["checks_executed"] == 2
+        assert response.data[0]["checks_failed"] == 1
+
+        scan = Scan.objects.get(id=response.data[0]["id"])
+        assert scan.provider == self.provider
+        assert scan.findings.get(check_parent=self.check).success
+        assert Check.objects.filter(provider=self.provider).count() == 2
+
+    def test_import_ocsf_invalid_file(self, api_client):
+        """Test that a file not being a JSON array is rejected without creating anything"""
+
+        upload = SimpleUploadedFile("output.json", b'{"not": "an array"}')
+        url = reverse("scans-import-ocsf")
+        response = api_client.post(url, {"file": upload}, format="multipart")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Scan.objects.exists()
+
+    def test_import_ocsf_existing_name(self, api_client):
+        """Test that importing with the name of an existing scan is rejected, also from the command"""
+
+        Scan.objects.create(provider=self.provider, name=SCANS["production"])
+        upload = SimpleUploadedFile("output.json", json.dumps(self.ocsf_findings).encode())
+        url = reverse("scans-import-ocsf")
+        response = api_client.post(url, {"file": upload, "name": SCANS["production"]}, format="multipart")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Scan.objects.count() == 1
+
+        with pytest.raises(OCSFImportError, match="too long"):
+            import_ocsf(io.StringIO("[]"), "x" * 129)
+
+    def test_import_ocsf_errors(self, api_client, monkeypatch):
+        """Test that a file not UTF-8 encoded is a `400`, and that other integrity errors are not an existing name"""
+
+        upload = SimpleUploadedFile("output.json", b'[{"status_code": "\xff"}]')
+        response = api_client.post(reverse("scans-import-ocsf"), {"file": upload}, format="multipart")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "UTF-8" in response.data["detail"]
+
+        def bulk_create(*args, **kwargs):
+            raise IntegrityError("duplicate key value violates unique constraint")
+
+        monkeypatch.setattr(Check.objects, "bulk_create", bulk_create)  # A check created by a concurrent import
+        with pytest.raises(IntegrityError):
+            import_ocsf(io.StringIO(json.dumps(self.ocsf_findings)), SCANS["production"])
+
+    def test_import_ocsf_times_to_utc(self):
+        """Test that finding times with an offset are converted to UTC, not just stripped of it"""
+
+        self.ocsf_findings[0]["time_dt"] = "2025-01-01T12:00:00+02:00"
+        self.ocsf_findings[1]["time_dt"] = "2025-01-01T11:30:00Z"
+        scan = import_ocsf(io.StringIO(json.dumps(self.ocsf_findings)), SCANS["production"])[0]
+
+        assert scan.started_at == datetime(2025, 1, 1, 10, 0)
+        assert scan.finished_at == datetime(2025, 1, 1, 11, 30)
+
+
+class TestAdmin:
+    """Test the admin scales with big tables"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self):
+        """Setup test data for each test"""
+
+        self.provider = Provider.objects.create(name=PROVIDERS["aws"])
+        self.check = Check.objects.create(provider=self.provider, name=CHECKS["aws_s3"])
+        self.scan = Scan.objects.create(provider=self.provider, name=SCANS["production"])
+        self.scan_other = Scan.objects.create(provider=self.provider, name=SCANS["staging"])
+        self.finding = Finding.objects.create(scan=self.scan, check_parent=self.check, success=True)
+
+    def test_finding_change_form_autocomplete(self, admin_client):
+        """Test that the finding change form searches scans and checks instead of rendering all of them"""
+
+        url = reverse("admin:api_finding_change", args=[self.finding.id])
+        response = admin_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        content = response.content.decode()
+        assert 'data-field-name="scan"' in content
+        assert 'data-field-name="check_parent"' in content
+        assert SCANS["staging"] not in content  # Only the selected scan is rendered
+
+    def test_finding_comment_changes_validators(self, api_client, admin_client):
+        """Test that commenting a finding in the admin changes the validators of the findings list of its scan"""
+
+        url = reverse("scan-findings-list", kwargs={"scan_pk": self.scan.id})
+        etag = api_client.get(url)["ETag"]
+
+        data = {"scan": self.scan.id, "check_parent": self.check.id, "success": "on", "comment": "Accepted risk"}
+        response = admin_client.post(reverse("admin:api_finding_change", args=[self.finding.id]), data)
+        assert response.status_code == status.HTTP_302_FOUND
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0]["comment"] == "Accepted risk"
+
+    def test_autocomplete_search(self, admin_client):
+        """Test that scans can be searched by name from the finding change form"""
+
+        url = reverse("admin:autocomplete")
+        params = {"term": "staging", "app_label": "api", "model_name": "finding", "field_name": "scan"}
+        response = admin_client.get(url, params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["id"] for result in response.json()["results"]] == [str(self.scan_other.id)]
+
+    def test_estimated_count_paginator(self, monkeypatch):
+        """Test that the estimate is only used on huge tables, otherwise the count is exact"""
+
+        paginator = admin.EstimatedCountPaginator(Finding.objects.all(), 100)
+        assert paginator.count == 1  # No estimate in SQLite
+
+        monkeypatch.setattr(admin, "estimate_count", lambda queryset: 5_000_000)
+        assert admin.EstimatedCountPaginator(Finding.objects.all(), 100).count == 5_000_000
+
+        monkeypatch.setattr(admin, "estimate_count", lambda queryset: 10)
+        assert admin.EstimatedCountPaginator(Finding.objects.all(), 100).count == 1
+
+
+class TestQueryBudgets:
+    """Test that the API routes and admin change lists run a constant number of queries, whatever the data size"""
+
+    # Dataset sizes: checks per provider and scans, both below the page sizes, so every row is rendered
+    SIZES = [2, 8]
+
+    # Max queries per route, update them when a query is added or removed on purpose
+    QUERY_BUDGETS = {
+        "health-list": 1,
+        "api-root": 0,
+        "providers-list": 2,
+        "providers-detail": 1,
+        "provider-checks-list": 3,
+        "provider-checks-detail": 2,
+        "provider-schedules-list": 4,
+        "provider-schedules-detail": 3,
+        "scans-list": 2,
+        "scans-detail": 1,
+        "scans-status": 1,
+        "scan-findings-list": 3,
+        "scan-findings-detail": 2,
+        "scan-findings-export": 2,
+        "admin-provider-changelist": 4,
+        "admin-check-changelist": 4,
+        "admin-scan-changelist": 4,
+        "admin-finding-changelist": 4,
+        "admin-scanschedule-changelist": 4,
+    }
+
+    # Max milliseconds per route, generous on purpose, as it is only meant to catch big regressions
+    TIME_BUDGET = 500
+
+    def measure_routes(self, api_client, admin_client, size):
+        seeding.seed(checks=size, scans=size, prefix=f"Budget {size}")
+        scan = Scan.objects.filter(name__startswith=f"Budget {size}").order_by("-created_at").first()
+        for index in range(size):
+            schedule = ScanSchedule.objects.create(provider=scan.provider, name=f"Budget {index}", cron="0 * * * *")
+            schedule.checks.set(scan.provider.checks.all())
+
+        routes = [(api_client, profiling.get_routes(scan)), (admin_client, profiling.get_admin_routes())]
+
+        results = {}
+        for client, name, url in ((client, *route) for client, urls in routes for route in urls.items()):
+            status_codes = []
+            results[name] = profiling.measure(lambda url=url: status_codes.append(profiling.get_url(client, url)))
+            assert status_codes[0] in [status.HTTP_200_OK, status.HTTP_503_SERVICE_UNAVAILABLE], name
+
+        return results
+
+    def test_query_budgets(self, api_client, admin_client):
+        """Test that query counts don't grow with the data and are within their budget, as the time is"""
+
+        small, large = (self.measure_routes(api_client, admin_client, size) for size in self.SIZES)
+
+        assert set(large) == set(self.QUERY_BUDGETS)  # New routes must get a budget
+        for name, result in large.items():
+            assert result["queries"] == small[name]["queries"], f"{name} queries grow with the data (N+1)"
+            assert result["queries"] <= self.QUERY_BUDGETS[name], f"{name} exceeds its query budget"
+            assert result["ms"] <= self.TIME_BUDGET, f"{name} exceeds the time budget"
+
+
 class TestWorkflow:
     """End-to-end integration tests simulating real workflows"""
 
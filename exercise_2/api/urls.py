@@ -3,16 +3,29 @@ from rest_framework_nested.routers import NestedDefaultRouter
 
 from api import views
 
+
+class NestedBulkRouter(NestedDefaultRouter):
+    """Nested router also routing `PATCH` of the list to the `bulk_partial_update` of the viewsets having it"""
+
+    routes = [
+        route._replace(mapping={**route.mapping, "patch": "bulk_partial_update"})
+        if route.name == "{basename}-list"
+        else route
+        for route in NestedDefaultRouter.routes
+    ]
+
+
 router = DefaultRouter()
 router.register(r"health", views.HealthViewSet, basename="health")
 router.register(r"providers", views.ProviderViewSet, basename="providers")
 
 providers_router = NestedDefaultRouter(router, r"providers", lookup="provider")
 providers_router.register(r"checks", views.CheckViewSet, basename="provider-checks")
+providers_router.register(r"schedules", views.ScanScheduleViewSet, basename="provider-schedules")
 
 router.register(r"scans", views.ScanViewSet, basename="scans")
 
-scans_router = NestedDefaultRouter(router, r"scans", lookup="scan")
+scans_router = NestedBulkRouter(router, r"scans", lookup="scan")
 scans_router.register(r"findings", views.FindingViewSet, basename="scan-findings")
 
 urlpatterns = router.urls + providers_router.urls + scans_router.urls
@@ -1,16 +1,102 @@
+import codecs
+
 from datetime import timedelta
+from functools import partial
 
-from django.db.models import Count, Q
-from django.shortcuts import get_object_or_404
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.utils import timezone
 from procrastinate.contrib.django import models as models_procrastinate
-from procrastinate.exceptions import ProcrastinateException
+from procrastinate.exceptions import AlreadyEnqueued, ProcrastinateException
 from rest_framework import status as http_status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ViewSet
 
-from api import models, serializers, tasks
+from api import catalog, events, exports, models, ocsf, pagination, serializers, tasks
+from api.conditional import ConditionalGetMixin
+from api.utils import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncActionsMixin:
+    """
+    ViewSet mixin serving the `async_actions` with their async version (`a` prefixed) when `API_ASYNC` is on, so slow
+    or many polling clients don't hold a server thread each.
+
+    Note:
+    A route is an async view if any of its actions is async, so the sync actions sharing it (e.g. `PUT` of a detail)
+    run in the thread of the request, as Django does with sync views under ASGI. With `API_ASYNC` off, the viewset is
+    served as always.
+    """
+
+    async_actions = []
+    is_async = False
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        is_async = settings.API_ASYNC and any(action in cls.async_actions for action in (actions or {}).values())
+        view = super().as_view(actions, is_async=is_async, **initkwargs)
+
+        return markcoroutinefunction(view) if is_async else view
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.is_async:
+            return self.adispatch(request, *args, **kwargs)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Same as DRF `dispatch`, but awaiting the async actions"""
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)  # Authentication may query the session
+
+            if self.action in self.async_actions:
+                response = await getattr(self, f"a{self.action}")(request, *args, **kwargs)
+
+            else:
+                handler = self.http_method_not_allowed
+                if request.method.lower() in self.http_method_names:
+                    handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        """Async version of `get_object`"""
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        obj = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+
+        return obj
+
+    async def alist_response(self, queryset):
+        """Async version of the `list` response, the serialized data is built here, so rendering doesn't query"""
+
+        page = await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
 
 
 class HealthViewSet(ViewSet):
@@ -32,13 +118,23 @@ class HealthViewSet(ViewSet):
             return Response({"status": "unhealthy"}, status=http_status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
-class ProviderViewSet(ModelViewSet):
-    queryset = models.Provider.objects.all().annotate(checks_total=Count("checks", distinct=True))
+class ProviderViewSet(catalog.CachedCatalogMixin, ModelViewSet):
     serializer_class = serializers.ProviderSerializer
+    conditional_fields = ["updated_at", "checks_total"]  # `checks_total` only if annotated
+    conditional_last_modified = False  # `checks_total` changes with the checks, not the provider `updated_at`
+
+    # Counting the checks is only paid if `checks_total` is requested
+    def get_queryset(self):
+        queryset = models.Provider.objects.all()
+        if serializers.get_requested_fields(self.request, ["checks_total"]):
+            queryset = queryset.annotate(checks_total=Count("checks", distinct=True))
+
+        return queryset
 
 
-class CheckViewSet(ModelViewSet):
+class CheckViewSet(catalog.CachedCatalogMixin, ModelViewSet):
     serializer_class = serializers.CheckSerializer
+    catalog_provider_kwarg = "provider_pk"
 
     # Check `provider` set on the URL exists
     def get_queryset(self):
@@ -52,45 +148,293 @@ class CheckViewSet(ModelViewSet):
         provider = get_object_or_404(models.Provider, pk=provider_id)
         serializer.save(provider=provider)
 
+    # Syncs the whole catalog of the provider in a request (e.g. the checks of a Prowler release), instead of a `POST`
+    # per check, with `prune` the checks not listed are deleted, but the ones with findings
+    @action(detail=False, methods=["post"], serializer_class=serializers.CheckBulkSerializer)
+    def bulk(self, request, provider_pk=None):
+        provider = get_object_or_404(models.Provider, pk=provider_pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(catalog.sync_checks(provider.id, **serializer.validated_data))
+
+
+class ScanScheduleViewSet(ModelViewSet):
+    serializer_class = serializers.ScanScheduleSerializer
+
+    # Check `provider` set on the URL exists
+    def get_queryset(self):
+        provider_id = self.kwargs["provider_pk"]
+        get_object_or_404(models.Provider, pk=provider_id)
+        queryset = models.ScanSchedule.objects.filter(provider_id=provider_id)
+        if serializers.get_requested_fields(self.request, ["check_ids"]):
+            queryset = queryset.prefetch_related("checks")
+
+        return queryset
 
-class ScanViewSet(ModelViewSet):
-    # As in `models.Scan.success`, check counts are costly, just for showing calculated fields in views and serializers
-    queryset = models.Scan.objects.all().annotate(
-        checks_total=Count("provider__checks", distinct=True),
-        checks_executed=Count("findings", distinct=True),
-        checks_pending=Count("provider__checks", distinct=True) - Count("findings", distinct=True),
-        checks_success=Count("findings", filter=Q(findings__success=True), distinct=True),
-        checks_failed=Count("findings", filter=Q(findings__success=False), distinct=True),
-    )
+    # Also here check `provider` on URL
+    def perform_create(self, serializer):
+        provider_id = self.kwargs["provider_pk"]
+        provider = get_object_or_404(models.Provider, pk=provider_id)
+        serializer.save(provider=provider)
+
+
+class ScanViewSet(AsyncActionsMixin, ConditionalGetMixin, ModelViewSet):
+    # Check counters are stored in the scan, maintained by `tasks.start_scan` as findings are written
+    queryset = models.Scan.objects.all()
     serializer_class = serializers.ScanSerializer
+    pagination_class = pagination.CreatedAtCursorPagination
+    async_actions = ["list", "retrieve", "status"]
+
+    async def alist(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        validators = self.get_page_validators(request, page)
+        return self.conditional_response(request, validators, partial(self.get_page_response, page))
+
+    async def aretrieve(self, request, pk=None):
+        scan = await self.aget_object()
+        validators = self.get_validators(request, [scan])
+        return self.conditional_response(request, validators, partial(self.get_object_response, scan))
+
+    # A coalesced scan is not created, the pending one is answered instead
+    def create(self, request, *args, **kwargs):
+        self.coalesced = False
+        response = super().create(request, *args, **kwargs)
+
+        if self.coalesced:
+            response.status_code = http_status.HTTP_200_OK
+
+        return response
 
     # Check `provider` set on POST data exists
     def perform_create(self, serializer):
         provider_id = self.request.data["provider_id"]
         provider = get_object_or_404(models.Provider, pk=provider_id)
-        serializer.save(provider=provider)
 
-        tasks.start_scan.defer(scan_id=str(serializer.instance.id))
+        # A scan can't have more shards than checks, and always has at least one
+        checks_total = provider.checks.count()
+        shards_total = max(1, min(settings.SCAN_SHARDS, checks_total))
+
+        if settings.SCAN_COALESCE:
+            pending_scan = self.coalesce_scan(serializer, provider, checks_total, shards_total)
+            if pending_scan is not None:
+                serializer.instance = pending_scan
+                self.coalesced = True
+
+            return
+
+        serializer.save(provider=provider, checks_total=checks_total, shards_total=shards_total)
+        tasks.defer_scan(serializer.instance)
+
+    def coalesce_scan(self, serializer, provider, checks_total, shards_total):
+        """
+        Create and defer the scan, unless one of the same provider and priority is still pending, which is returned.
+
+        Note:
+        The pending scan is detected by the queueing lock of its job, so concurrent requests can't both create one. The
+        new scan is rolled back along with its job. If the lock is held by a re-queued job of a running scan, the new
+        scan is created without it.
+        """
+
+        try:
+            with transaction.atomic():
+                serializer.save(provider=provider, checks_total=checks_total, shards_total=shards_total)
+                tasks.defer_scan(serializer.instance, coalesce=True)
+                return None
+
+        except AlreadyEnqueued:
+            priority = serializer.instance.priority
+            serializer.instance = None
+
+        pending_scan = (
+            models.Scan.objects.filter(provider=provider, priority=priority, status=models.Scan.Status.PENDING)
+            .order_by("created_at")
+            .first()
+        )
+        if pending_scan is None:
+            serializer.save(provider=provider, checks_total=checks_total, shards_total=shards_total)
+            tasks.defer_scan(serializer.instance)
+
+        return pending_scan
+
+    # Imports a Prowler OCSF JSON file, uploaded as `file`, as a completed scan per provider
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def import_ocsf(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Validation error", "detail": "An OCSF JSON `file` must be uploaded"},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            scans = ocsf.import_ocsf(
+                codecs.getreader("utf-8")(upload), request.data.get("name"), request.data.get("comment")
+            )
+
+        except ocsf.OCSFImportError as error:
+            return Response(
+                {"error": "Validation error", "detail": str(error)}, status=http_status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(scans, many=True)
+        return Response(serializer.data, status=http_status.HTTP_201_CREATED)
 
     # This action is not really needed, beacuse we can use the regular `/scans/<scan_id>/` endpoint to get the status
+    # But it allows long-polling: with `?wait=<seconds>` it answers as soon as the status is not `?status=` (the current
+    # one by default), or with the current one after waiting, so waiting clients don't query the database every second
+    # Note: it's subscribed, and the listener is `LISTEN`ing, before reading the scan, so a change between both is not
+    # missed. Only async views wait, as a sync waiting client would hold a server worker (see `get_status_wait`)
     @action(detail=True, methods=["get"])
     def status(self, request, pk=None):
-        scan = self.get_object()
-        return Response({"status": scan.status})
+        wait = self.get_status_wait()  # Always `0` here, only validated
+        if isinstance(wait, Response):
+            return wait
+
+        return Response(self.get_status_data(self.get_object()))
+
+    async def astatus(self, request, pk=None):
+        wait = self.get_status_wait()
+        if isinstance(wait, Response):
+            return wait
+
+        subscription = events.listener.subscribe(pk)
+        try:
+            # Waiting without `LISTEN` would miss the changes, so the current status is answered at once, telling it
+            ready = not wait or await events.listener.async_wait_ready()
+            if not ready:
+                logger.warning(f"({pk}) Scan status listener not ready, answering the status without waiting")
+
+            scan = await self.aget_object()
+            if not ready:
+                return Response(self.get_status_data(scan), headers={"X-Long-Poll": "unavailable"})
+
+            if not wait or self.is_status_changed(scan):
+                return Response(self.get_status_data(scan))
+
+            return Response({"status": await subscription.async_wait(wait) or scan.status})
+
+        finally:
+            events.listener.unsubscribe(subscription)
+
+    def get_status_wait(self):
+        """
+        Seconds to wait for a status change, up to `SCAN_STATUS_MAX_WAIT`, or the validation error response.
 
+        Note:
+        Without `API_ASYNC`, `wait` is ignored and the status is answered at once, as a waiting client would hold one of
+        the few sync server workers (a single one by default), stalling the whole API.
+        """
 
-class FindingViewSet(ModelViewSet):
+        try:
+            wait = float(self.request.query_params.get("wait", 0))
+
+        except ValueError:
+            return Response(
+                {"error": "Validation error", "detail": "`wait` must be a number of seconds"},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not self.is_async:
+            return 0
+
+        return min(max(wait, 0), settings.SCAN_STATUS_MAX_WAIT)
+
+    def get_status_data(self, scan):
+        """The status, and the progress while the scan is running"""
+
+        if scan.progress is None:
+            return {"status": scan.status}
+
+        return {"status": scan.status, "progress": serializers.ScanProgressSerializer(scan.progress).data}
+
+    def is_status_changed(self, scan):
+        """A finished scan won't change anymore, so it's answered at once as a changed one"""
+
+        known_status = self.request.query_params.get("status", scan.status)
+        return scan.status != known_status or scan.status in models.Scan.FINISHED_STATUSES
+
+
+class FindingViewSet(AsyncActionsMixin, ConditionalGetMixin, ModelViewSet):
     serializer_class = serializers.FindingSerializer
+    pagination_class = pagination.CreatedAtCursorPagination
     http_method_names = ["options", "get", "put", "patch"]  # No POST or DELETE allowed
+    async_actions = ["list"]
+    scan_conditional_fields = ["updated_at", "checks_executed", "checks_success", "checks_failed"]
+
+    # Check `scan` set on the URL exists, fetched once per request
+    def get_scan(self):
+        if not hasattr(self, "scan"):
+            self.scan = get_object_or_404(models.Scan, pk=self.kwargs["scan_pk"])
+
+        return self.scan
 
-    # Check `scan` set on the URL exists
     def get_queryset(self):
-        scan_id = self.kwargs["scan_pk"]
-        get_object_or_404(models.Scan, pk=scan_id)
-        return models.Finding.objects.filter(scan_id=scan_id)
+        return models.Finding.objects.filter(scan_id=self.get_scan().id)
+
+    # Findings are only written along the scan counters, or by the views below bumping the scan `updated_at`, so the
+    # list validators are built from the scan, without fetching the page nor counting the findings
+    def get_list_validators(self, request):
+        return self.get_validators(
+            request, [self.get_scan()], fields=self.scan_conditional_fields, with_last_modified=False
+        )
+
+    async def alist(self, request, scan_pk=None):
+        validators = await sync_to_async(self.get_list_validators)(request)
+        queryset = models.Finding.objects.filter(scan_id=scan_pk)
+        return await self.aconditional_response(request, validators, partial(self.alist_response, queryset))
 
     # Also here check `scan` on URL
     def perform_create(self, serializer):
         scan_id = self.kwargs["scan_pk"]
         scan = get_object_or_404(models.Scan, pk=scan_id)
         serializer.save(scan=scan)
+
+    # Streams all the findings of the scan as NDJSON or CSV (`?type=csv`), instead of paging through them
+    # Note: `?format=` can't be used, as it's already used by DRF for choosing the renderer
+    @action(detail=False, methods=["get"])
+    def export(self, request, scan_pk=None):
+        export_type = request.query_params.get("type", "ndjson")
+        if export_type not in exports.EXPORT_FORMATS:
+            return Response(
+                {"error": "Validation error", "detail": f"`type` must be one of {list(exports.EXPORT_FORMATS)}"},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+
+        to_format, content_type = exports.EXPORT_FORMATS[export_type]
+        rows = exports.iter_findings(self.get_queryset(), settings.EXPORT_CHUNK_SIZE)
+
+        response = StreamingHttpResponse(to_format(rows), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="scan-{scan_pk}-findings.{export_type}"'
+        return response
+
+    # Triages many findings of the scan at once (`PATCH` of the list), setting their `comment` with a single `UPDATE`
+    # Note: `success` can't be updated here, so the scan counters stay right
+    def bulk_partial_update(self, request, scan_pk=None):
+        scan = self.get_scan()
+        serializer = serializers.FindingBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        findings = models.Finding.objects.filter(scan=scan)
+        if "ids" in data:
+            findings = findings.filter(id__in=data["ids"])
+        if "success" in data:
+            findings = findings.filter(success=data["success"])
+        if "check_ids" in data:
+            findings = findings.filter(check_parent_id__in=data["check_ids"])
+
+        # `update` doesn't set `auto_now` fields, so `updated_at` is set here, and the scan is touched for the
+        # conditional `GET` validators of its findings
+        updated = findings.update(comment=data["comment"], updated_at=timezone.now())
+        if updated:
+            models.Scan.objects.filter(id=scan.id).touch()
+
+        return Response({"updated": updated})
+
+    # Keep the scan counters right if `success` is changed, else touch the scan for the validators of its findings
+    def perform_update(self, serializer):
+        previous_success = serializer.instance.success
+        finding = serializer.save()
+        finding.update_scan_counters(previous_success)
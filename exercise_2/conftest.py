@@ -1,5 +1,6 @@
 import pytest
 
+from django.core.cache import cache
 from procrastinate import testing
 from procrastinate.contrib.django import procrastinate_app as procrastinate
 from rest_framework.test import APIClient
@@ -38,6 +39,13 @@ def enable_db_access_for_all_tests(db):
     yield
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Clear the cache, as the database, between tests."""
+    cache.clear()
+    yield
+
+
 @pytest.fixture
 def api_client():
     """API client fixture for making HTTP requests."""
@@ -8,7 +8,7 @@ if [ $1 = "test" ]; then
     ENVIRONMENT=test exec pytest -v --no-migrations --cov
 
 elif [ $1 = "worker" ]; then
-    exec python manage.py procrastinate worker --concurrency $WORKER_CONCURRENCY
+    exec python manage.py procrastinate worker --concurrency $WORKER_CONCURRENCY ${WORKER_QUEUES:+--queues $WORKER_QUEUES}
 
 elif [ $1 = "debug-api" ]; then
     exec python -m debugpy --listen 0.0.0.0:$DEBUG_API_PORT manage.py runserver 0.0.0.0:$API_PORT --noreload
@@ -21,6 +21,9 @@ elif [ $ENVIRONMENT = "local" ]; then
 
 else
     python manage.py collectstatic --noinput
-    exec gunicorn --bind 0.0.0.0:$API_PORT prowler_manager.wsgi:application
+    if [ "$API_ASYNC" = "true" ]; then
+        exec uvicorn --host 0.0.0.0 --port $API_PORT --workers ${API_WORKERS:-1} prowler_manager.asgi:application
+    fi
+    exec gunicorn --bind 0.0.0.0:$API_PORT --workers ${API_WORKERS:-1} prowler_manager.wsgi:application
 
 fi
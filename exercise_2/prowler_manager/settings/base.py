@@ -152,6 +152,20 @@ LOGGING = {
     },
 }
 
+# Cache, `locmem` is per process, `file` is shared by the processes of the same host and `dummy` disables it
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": {
+            "locmem": "django.core.cache.backends.locmem.LocMemCache",
+            "file": "django.core.cache.backends.filebased.FileBasedCache",
+            "dummy": "django.core.cache.backends.dummy.DummyCache",
+        }[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", "/tmp/prowler-manager-cache"),
+    }
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
@@ -163,3 +177,16 @@ REST_FRAMEWORK = {
 CHECK_SLEEP_TIME = float(os.environ.get("CHECK_SLEEP_TIME", "3.0"))
 CHECK_EXCEPTION_RATE = float(os.environ.get("CHECK_EXCEPTION_RATE", "0.05"))  # If check raise an exception, scan fails
 CHECK_SUCCESS_RATE = float(os.environ.get("CHECK_SUCCESS_RATE", "0.8"))
+CHECK_CONCURRENCY = int(os.environ.get("CHECK_CONCURRENCY", "4"))  # Checks running at the same time for a single scan
+FINDINGS_BATCH_SIZE = int(os.environ.get("FINDINGS_BATCH_SIZE", "100"))  # Findings inserted at once by a scan
+FINDINGS_FLUSH_INTERVAL = float(os.environ.get("FINDINGS_FLUSH_INTERVAL", "10.0"))  # Max seconds findings are buffered
+SCAN_SHARDS = int(os.environ.get("SCAN_SHARDS", "1"))  # Jobs a scan is split into, so it can use several worker slots
+SCAN_PROVIDER_CONCURRENCY = int(os.environ.get("SCAN_PROVIDER_CONCURRENCY", "0"))  # Max running scan jobs, 0 is no max
+SCAN_COALESCE = os.environ.get("SCAN_COALESCE", "false").lower() == "true"  # New scans join the pending one
+INCREMENTAL_SCAN_TTL = float(os.environ.get("INCREMENTAL_SCAN_TTL", "86400.0"))  # Max age of a copied forward result
+SCAN_SCHEDULE_JITTER = float(os.environ.get("SCAN_SCHEDULE_JITTER", "300.0"))  # Max seconds a scheduled scan waits
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", "300"))  # Max seconds the catalog is cached
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "2000"))  # Rows fetched at once when exporting findings
+API_ASYNC = os.environ.get("API_ASYNC", "false").lower() == "true"  # Serve with uvicorn and async read views
+SCAN_STATUS_MAX_WAIT = float(os.environ.get("SCAN_STATUS_MAX_WAIT", "30.0"))  # Max seconds of a status long-poll
+SCAN_STALLED_SECONDS = float(os.environ.get("SCAN_STALLED_SECONDS", "60.0"))  # No worker heartbeat, scan re-queued